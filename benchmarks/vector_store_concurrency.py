@@ -0,0 +1,193 @@
+"""Compares the threadpool and the async-native vector store paths under concurrency.
+
+Runs N concurrent upserts and N concurrent searches against the configured vector backend
+(VECTOR_BACKEND, CHROMADB_HOST, ...) once through the thread pool, like ingestion and
+retrieval used to, and once through the async methods of VectorService. Embeddings are
+computed locally from a hash so only vector store access is measured.
+
+Benchmark notebooks start at --notebook-offset and belong to the made-up owner --owner-id.
+Local files (persistent and flat vectors, lexical indexes, the embedding cache) go to a
+temporary directory, and collections the run created are dropped again afterwards.
+
+    OPENAI_API_KEY=unused python -m benchmarks.vector_store_concurrency --concurrency 200
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import statistics
+import tempfile
+import time
+
+from src.ai_providers.collection_layout import collection_names
+from src.ai_providers.vector_store import VectorService
+from src.config import settings
+
+from fastapi.concurrency import run_in_threadpool
+from langchain_core.embeddings import Embeddings
+
+
+DIMENSIONS = 256
+
+
+class HashEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        digest = b""
+        while len(digest) < DIMENSIONS:
+            digest += hashlib.sha256(digest + text.encode()).digest()
+        return [byte / 255 for byte in digest[:DIMENSIONS]]
+
+
+def make_batch(notebook_id: int, source_id: int, size: int, embeddings: Embeddings):
+    documents = [f"Notebook {notebook_id} source {source_id} chunk {index}" for index in range(size)]
+    return {
+        "ids": [f"source_{source_id}_chunk_{index}" for index in range(size)],
+        "embeddings": embeddings.embed_documents(documents),
+        "documents": documents,
+        "metadatas": [
+            {"notebook_id": notebook_id, "source_id": source_id, "chunk_index": index}
+            for index in range(size)
+        ],
+    }
+
+
+def upsert_records(vector_service: VectorService, notebook_id: int, **batch):
+    # The blocking write ingestion used to run in the thread pool
+    vector_service.ensure_lexical_index(notebook_id)
+    vector_service.get_raw_collection(notebook_id).upsert(**batch)
+    vector_service.lexical_index.add(notebook_id, batch["ids"], batch["documents"], batch["metadatas"])
+
+
+async def timed(operation) -> float:
+    started = time.perf_counter()
+    await operation
+    return (time.perf_counter() - started) * 1000
+
+
+async def probe_threadpool(latencies: list, stop: asyncio.Event):
+    # Stands in for the rest of the app's thread-bound work (file writes, bcrypt, page
+    # counting) and records how long it waits for a free worker while the load runs
+    while not stop.is_set():
+        latencies.append(await timed(run_in_threadpool(lambda: None)))
+        await asyncio.sleep(0.005)
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)]
+
+
+async def measure(make_operations) -> dict:
+    probe, stop = [], asyncio.Event()
+    prober = asyncio.create_task(probe_threadpool(probe, stop))
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(timed(operation) for operation in make_operations()))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "probe_p95": percentile(probe, 0.95) if probe else 0.0,
+    }
+
+
+async def compare(label: str, threadpool, native, rounds: int):
+    # The paths alternate so server-side effects (compaction, caches) hit both alike
+    results = {"threadpool": [], "async": []}
+    for round_index in range(rounds):
+        order = [("threadpool", threadpool), ("async", native)]
+        for path, make_operations in order if round_index % 2 == 0 else reversed(order):
+            results[path].append(await measure(make_operations))
+
+    for path, runs in results.items():
+        best = sorted(runs, key=lambda run: run["throughput"])[len(runs) // 2]
+        print(
+            f"{label + ' / ' + path:<22} {best['throughput']:>9.1f} ops/s"
+            f"  p50 {best['p50']:>8.1f} ms  p95 {best['p95']:>8.1f} ms"
+            f"  threadpool wait p95 {best['probe_p95']:>7.1f} ms"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--notebooks", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--notebook-offset", type=int, default=900_000)
+    parser.add_argument("--owner-id", type=int, default=900_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="vector_benchmark_") as directory:
+        settings.VECTOR_STORE_PATH = os.path.join(directory, "vectors")
+        settings.LEXICAL_INDEX_DIR = os.path.join(directory, "lexical")
+        settings.EMBEDDING_CACHE_PATH = os.path.join(directory, "embeddings.sqlite3")
+        await run(args)
+
+
+async def run(args):
+    vector_service = VectorService()
+    vector_service.embeddings = HashEmbeddings()
+    notebook_ids = [args.notebook_offset + index for index in range(args.notebooks)]
+    # Under the per-user layout this keeps the benchmark out of real users' collections
+    for notebook_id in notebook_ids:
+        vector_service.set_notebook_owner(notebook_id, args.owner_id)
+    existing = collection_names(vector_service.client)
+
+    batches = [
+        (notebook_ids[index % len(notebook_ids)], index)
+        for index in range(args.concurrency)
+    ]
+    prepared = {
+        (notebook_id, source_id): make_batch(notebook_id, source_id, args.batch_size, vector_service.embeddings)
+        for notebook_id, source_id in batches
+    }
+    # Open every collection once so neither path pays for creating them
+    for notebook_id in notebook_ids:
+        vector_service.get_collection(notebook_id)
+        await vector_service.aget_raw_collection(notebook_id)
+
+    print(f"{args.concurrency} concurrent operations, backend {type(vector_service.client).__name__}")
+
+    await compare(
+        "upsert",
+        lambda: [
+            run_in_threadpool(upsert_records, vector_service, notebook_id, **prepared[notebook_id, source_id])
+            for notebook_id, source_id in batches
+        ],
+        lambda: [
+            vector_service.aupsert_records(notebook_id, **prepared[notebook_id, source_id])
+            for notebook_id, source_id in batches
+        ],
+        args.rounds,
+    )
+
+    for mode in ("base", "mmr", "hybrid"):
+        await compare(
+            mode,
+            lambda: [
+                vector_service.get_retriever(notebook_id, mode=mode).ainvoke(f"chunk {source_id}")
+                for notebook_id, source_id in batches
+            ],
+            lambda: [
+                vector_service.asearch(notebook_id, f"chunk {source_id}", mode=mode)
+                for notebook_id, source_id in batches
+            ],
+            args.rounds,
+        )
+
+    for notebook_id in notebook_ids:
+        await vector_service.adelete_records(notebook_id)
+    # Shared collections that held data before the run are only emptied of benchmark chunks
+    for name in collection_names(vector_service.client) - existing:
+        vector_service.client.delete_collection(name)
+    await vector_service.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from .schemas import AskQuestionResponse
+
+import numpy as np
+
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+
+@dataclass
+class _Entry:
+    question: str
+    scope: tuple
+    vector: np.ndarray
+    response: AskQuestionResponse
+    created_at: float
+
+
+class _NotebookEntries:
+    def __init__(self, version: int):
+        self.version = version
+        self.entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        # When the newest entry expires, and with it the whole bucket
+        self.expires_at = 0.0
+
+
+# Per-notebook answers keyed by (normalized standalone question, scope). An entry is only
+# valid for the notebook's sources_version it was stored under; a bump drops the bucket.
+# Buckets are kept for the max_notebooks most recently used notebooks, and dropped once
+# all of their entries expired.
+class AnswerCache:
+    def __init__(self, similarity_threshold: float, max_entries: int, ttl_seconds: int, max_notebooks: int):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_notebooks = max_notebooks
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._notebooks: OrderedDict[int, _NotebookEntries] = OrderedDict()
+
+    def _bucket(self, notebook_id: int, version: int, now: float) -> Optional[_NotebookEntries]:
+        bucket = self._notebooks.get(notebook_id)
+        if bucket is not None and (bucket.version != version or bucket.expires_at < now):
+            del self._notebooks[notebook_id]
+            bucket = None
+        if bucket is not None:
+            self._notebooks.move_to_end(notebook_id)
+        return bucket
+
+    def _evict(self, now: float):
+        for notebook_id in [notebook_id for notebook_id, bucket in self._notebooks.items() if bucket.expires_at < now]:
+            del self._notebooks[notebook_id]
+        while len(self._notebooks) > self.max_notebooks:
+            self._notebooks.popitem(last=False)
+
+    def lookup(
+        self,
+        notebook_id: int,
+        version: int,
+        scope: tuple,
+        question: str,
+        vector: list[float],
+    ) -> Optional[tuple[AskQuestionResponse, float]]:
+        now = time.time()
+        with self._lock:
+            bucket = self._bucket(notebook_id, version, now)
+            if bucket is None:
+                self.misses += 1
+                return None
+            for key in [key for key, entry in bucket.entries.items() if now - entry.created_at > self.ttl_seconds]:
+                del bucket.entries[key]
+
+            exact = bucket.entries.get((question, scope))
+            if exact is not None:
+                bucket.entries.move_to_end((question, scope))
+                self.hits += 1
+                return exact.response, 1.0
+
+            candidates = [entry for entry in bucket.entries.values() if entry.scope == scope]
+            if candidates:
+                query = np.asarray(vector, dtype=np.float32)
+                matrix = np.stack([entry.vector for entry in candidates])
+                norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+                similarities = matrix @ query / np.where(norms == 0, 1, norms)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry = candidates[best]
+                    bucket.entries.move_to_end((entry.question, entry.scope))
+                    self.hits += 1
+                    return entry.response, float(similarities[best])
+
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        notebook_id: int,
+        version: int,
+        scope: tuple,
+        question: str,
+        vector: list[float],
+        response: AskQuestionResponse,
+    ):
+        now = time.time()
+        with self._lock:
+            bucket = self._bucket(notebook_id, version, now)
+            if bucket is None:
+                bucket = self._notebooks[notebook_id] = _NotebookEntries(version)
+            bucket.entries[(question, scope)] = _Entry(
+                question=question,
+                scope=scope,
+                vector=np.asarray(vector, dtype=np.float32),
+                response=response.model_copy(deep=True),
+                created_at=now,
+            )
+            bucket.entries.move_to_end((question, scope))
+            bucket.expires_at = now + self.ttl_seconds
+            while len(bucket.entries) > self.max_entries:
+                bucket.entries.popitem(last=False)
+            self._evict(now)
@@ -0,0 +1,56 @@
+import asyncio
+
+from langchain_core.documents import Document
+
+
+# httpcore's async pool walks every waiting request and every connection whenever a request
+# starts or ends, so its overhead grows quadratically with the number in flight. Requests
+# queue on a semaphore instead and the pool only ever sees a handful at a time.
+class BoundedAsyncCollection:
+    def __init__(self, collection, limiter: asyncio.Semaphore):
+        self.collection = collection
+        self.limiter = limiter
+
+    async def upsert(self, **kwargs):
+        async with self.limiter:
+            return await self.collection.upsert(**kwargs)
+
+    async def get(self, **kwargs):
+        async with self.limiter:
+            return await self.collection.get(**kwargs)
+
+    async def query(self, **kwargs):
+        async with self.limiter:
+            return await self.collection.query(**kwargs)
+
+    async def delete(self, **kwargs):
+        async with self.limiter:
+            return await self.collection.delete(**kwargs)
+
+
+# The embedded backends (Chroma's persistent client, the flat index) only have sync
+# collections doing local disk and index work, so each call is one hop to a thread.
+class ThreadedAsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def upsert(self, **kwargs):
+        return await asyncio.to_thread(self.collection.upsert, **kwargs)
+
+    async def get(self, **kwargs):
+        return await asyncio.to_thread(self.collection.get, **kwargs)
+
+    async def query(self, **kwargs):
+        return await asyncio.to_thread(self.collection.query, **kwargs)
+
+    async def delete(self, **kwargs):
+        return await asyncio.to_thread(self.collection.delete, **kwargs)
+
+
+def query_result_documents(results: dict, index: int = 0) -> list[Document]:
+    return [
+        Document(id=record_id, page_content=document or "", metadata=metadata or {})
+        for record_id, document, metadata in zip(
+            results["ids"][index], results["documents"][index], results["metadatas"][index]
+        )
+    ]
@@ -0,0 +1,78 @@
+from typing import Optional
+
+
+LAYOUTS = ("notebook", "user", "shard")
+
+
+# Which vector collection a notebook's chunks live in. "notebook" keeps one collection per
+# notebook, "user" one per notebook owner and "shard" spreads notebooks over a fixed number
+# of shared collections. Shared collections rely on the notebook_id metadata filter every
+# read applies for isolation.
+class CollectionLayout:
+    def __init__(self, kind: str, shards: int = 1):
+        if kind not in LAYOUTS:
+            raise ValueError(f"Unknown collection layout: {kind}")
+        if kind == "shard" and shards < 1:
+            raise ValueError("A sharded layout needs at least one shard")
+        self.kind = kind
+        self.shards = shards
+
+    @property
+    def shared(self) -> bool:
+        return self.kind != "notebook"
+
+    @property
+    def needs_owner(self) -> bool:
+        return self.kind == "user"
+
+    def collection_name(self, notebook_id: int, owner_id: Optional[int] = None) -> str:
+        if self.kind == "user":
+            if owner_id is None:
+                raise LookupError(f"Owner of notebook {notebook_id} is not known")
+            return f"user_{owner_id}"
+        if self.kind == "shard":
+            return f"shard_{notebook_id % self.shards}"
+        return f"notebook_{notebook_id}"
+
+
+def collection_names(client) -> set[str]:
+    # Chroma returns Collection objects, the flat index plain names
+    return {getattr(collection, "name", collection) for collection in client.list_collections()}
+
+
+def move_notebook_vectors(client, notebook_id: int, from_name: str, to_name: str, batch_size: int) -> int:
+    # Copies ids, embeddings, documents and metadata as stored, so nothing is re-embedded.
+    # The chunks are only removed from the source once the target holds all of them, so an
+    # interrupted run can simply be started again.
+    if from_name == to_name:
+        return 0
+
+    source = client.get_collection(from_name)
+    target = client.get_or_create_collection(to_name, embedding_function=None)
+    where = {"notebook_id": notebook_id}
+
+    moved = 0
+    while True:
+        records = source.get(
+            where=where,
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=moved,
+        )
+        if not len(records["ids"]):
+            break
+        target.upsert(
+            ids=records["ids"],
+            embeddings=records["embeddings"],
+            documents=records["documents"],
+            metadatas=records["metadatas"],
+        )
+        moved += len(records["ids"])
+
+    copied = len(target.get(where=where, include=[])["ids"])
+    if copied < moved:
+        raise RuntimeError(f"Notebook {notebook_id}: {copied} of {moved} chunks arrived in {to_name}")
+
+    if moved:
+        source.delete(where=where)
+    return moved
@@ -24,4 +24,15 @@ REPHRASE_SYSTEM_INSTRUCTION = (
     "3. The query must be descriptive and focused on retrieving information from documents.\n"
     "4. Do NOT ask the user for clarification. Do NOT answer the question. \n"
     "5. Return ONLY the rephrased query text in the same language as the user's message."
+)
+
+SUMMARY_SYSTEM_INSTRUCTION = (
+    "You maintain the running memory of a conversation between a user and a research assistant. "
+    "You get the current summary and the messages that happened after it.\n\n"
+    "Rules:\n"
+    "1. Return an updated summary that merges the new messages into the current summary.\n"
+    "2. Keep the topics discussed, the user's goals, names, numbers and conclusions; drop greetings and repetition.\n"
+    "3. Keep citations (source_id and page) only for key facts.\n"
+    "4. Write at most 200 words, in the language of the conversation.\n"
+    "5. Return ONLY the summary text."
 )
\ No newline at end of file
@@ -0,0 +1,86 @@
+from src.ai_providers.pdf_parsing import CHUNK_OVERLAP
+from src.ai_providers.tokens import count_tokens, truncate_to_tokens
+
+from langchain_core.documents import Document
+
+
+# Shorter matches between neighbouring chunks are more likely coincidence than splitter overlap
+MIN_OVERLAP = 8
+# Don't bother squeezing a truncated span into less room than this
+MIN_TRUNCATED_TOKENS = 50
+
+
+def strip_overlap(previous: str, following: str, max_overlap: int = 2 * CHUNK_OVERLAP) -> str:
+    for size in range(min(len(previous), len(following), max_overlap), MIN_OVERLAP - 1, -1):
+        if previous.endswith(following[:size]):
+            return following[size:]
+    return following
+
+
+def merge_adjacent_chunks(docs: list[Document]) -> list[Document]:
+    # Docs come in relevance order; a merged span ranks as its most relevant chunk
+    ranked: dict[tuple, tuple[int, Document]] = {}
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get("source_id"), doc.metadata.get("chunk_index"))
+        ranked.setdefault(key, (rank, doc))
+
+    indexed = [item for key, item in ranked.items() if key[1] is not None]
+    indexed.sort(key=lambda item: (str(item[1].metadata.get("source_id")), item[1].metadata["chunk_index"]))
+
+    spans: list[tuple[int, Document]] = []
+    for rank, doc in indexed:
+        if spans:
+            span_rank, span = spans[-1]
+            if (
+                span.metadata.get("source_id") == doc.metadata.get("source_id")
+                and span.metadata["chunk_end"] + 1 == doc.metadata["chunk_index"]
+            ):
+                span.page_content += " " + strip_overlap(span.page_content, doc.page_content.strip()).strip()
+                span.metadata["chunk_end"] = doc.metadata["chunk_index"]
+                span.metadata["page_end"] = doc.metadata.get("page", span.metadata["page_end"])
+                spans[-1] = (min(span_rank, rank), span)
+                continue
+
+        metadata = dict(doc.metadata)
+        metadata["chunk_end"] = metadata["chunk_index"]
+        metadata["page_end"] = metadata.get("page")
+        spans.append((rank, Document(page_content=doc.page_content.strip(), metadata=metadata)))
+
+    # Chunks without an index (e.g. from older ingestions) can't be merged and are kept as is
+    spans.extend(item for key, item in ranked.items() if key[1] is None)
+    spans.sort(key=lambda item: item[0])
+    return [span for _, span in spans]
+
+
+def format_block(doc: Document) -> str:
+    s_id = doc.metadata.get("source_id", "N/A")
+    page = doc.metadata.get("page")
+    page_end = doc.metadata.get("page_end", page)
+    if page is None:
+        pages = "Page: ?"
+    elif page_end is not None and page_end != page:
+        pages = f"Pages: {page + 1}-{page_end + 1}"
+    else:
+        pages = f"Page: {page + 1}"
+    content = doc.page_content.replace("\n", " ").strip()
+    return f"[Source ID: {s_id}, {pages}] | Content: {content}"
+
+
+def pack_documents(docs: list[Document], token_budget: int, model: str = "") -> tuple[list[Document], int]:
+    packed, used = [], 0
+    for span in merge_adjacent_chunks(docs):
+        tokens = count_tokens(format_block(span), model)
+        # Blocks are joined with a blank line, roughly one token
+        remaining = token_budget - used - (1 if packed else 0)
+        if tokens > remaining:
+            if remaining < MIN_TRUNCATED_TOKENS:
+                continue
+            header_tokens = count_tokens(format_block(Document(page_content="", metadata=span.metadata)), model)
+            span.page_content = truncate_to_tokens(span.page_content, remaining - header_tokens, model)
+            tokens = count_tokens(format_block(span), model)
+            if tokens > remaining:
+                continue
+
+        used += tokens + (1 if packed else 0)
+        packed.append(span)
+    return packed, used
@@ -1,12 +1,36 @@
-from functools import lru_cache
-from typing import Annotated
+import logging
+from typing import Annotated, Optional
 
 from .vector_store import VectorService
 
 from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
+
+
+logger = logging.getLogger(__name__)
+
+_vector_service: Optional[VectorService] = None
+
 
-@lru_cache()
 def get_vector_service() -> VectorService:
-    return VectorService()
+    # The app lifespan creates the instance; scripts and workers outside it get it on first use
+    global _vector_service
+    if _vector_service is None:
+        _vector_service = VectorService()
+    return _vector_service
+
+async def start_vector_service(warm_notebooks: dict[int, int] = None) -> VectorService:
+    vector_service = await run_in_threadpool(get_vector_service)
+    try:
+        await run_in_threadpool(vector_service.warm_up, warm_notebooks)
+    except Exception:
+        logger.warning("Vector service warm-up failed", exc_info=True)
+    return vector_service
+
+async def stop_vector_service():
+    global _vector_service
+    if _vector_service is not None:
+        await _vector_service.aclose()
+        _vector_service = None
 
 VectorServiceDep = Annotated[VectorService, Depends(get_vector_service)]
@@ -0,0 +1,73 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+
+# Merges concurrent aembed_documents calls, e.g. from several files being ingested at once,
+# into requests of up to batch_size texts. A request goes out as soon as it is full, or
+# linger_seconds after its first text arrived.
+class BatchingEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, batch_size: int, linger_seconds: float):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.linger_seconds = linger_seconds
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle = None
+        self._requests: set[asyncio.Task] = set()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            futures.append(future)
+            self._pending.append((text, future))
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+        if self._pending and self._timer is None:
+            self._timer = loop.call_later(self.linger_seconds, self._flush)
+        return list(await asyncio.gather(*futures))
+
+    async def aembed_query(self, text: str) -> list[float]:
+        # Queries sit on the answer path and never wait for a batch to fill
+        return await self.embeddings.aembed_query(text)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        if not batch:
+            return
+        request = asyncio.create_task(self._send(batch))
+        self._requests.add(request)
+        request.add_done_callback(self._requests.discard)
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.linger_seconds, self._flush)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future]]):
+        # Texts whose callers went away (cancelled ingestion) are not sent at all
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+        try:
+            vectors = await self.embeddings.aembed_documents([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Optional
+
+from src.cache import Cache
+
+from langchain_core.embeddings import Embeddings
+
+
+# Hits only rewrite last_used when it is older than this, so most lookups stay read-only.
+# Eviction order is accurate to within the interval, which is plenty for an LRU of this size.
+TOUCH_INTERVAL_SECONDS = 60 * 60
+
+# Embeddings wrapper with an on-disk SQLite store keyed by (model, text hash).
+# Least recently used vectors are evicted once the store grows past max_bytes. Async query
+# embeddings are also looked up in query_cache, which every worker shares when Redis is set.
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, model: str, path: str, max_bytes: int, query_cache: Optional[Cache] = None):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_bytes = max_bytes
+        self.query_cache = query_cache
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, hashes: list[str]) -> dict[str, list[float]]:
+        found, stale = {}, []
+        if not hashes:
+            return found
+
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector, last_used FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model, *batch],
+                ).fetchall()
+                for text_hash, blob, last_used in rows:
+                    found[text_hash] = array("f", blob).tolist()
+                    if last_used < now - TOUCH_INTERVAL_SECONDS:
+                        stale.append(text_hash)
+
+            if stale:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, self.model, text_hash) for text_hash in stale],
+                )
+                self._conn.commit()
+        return found
+
+    def _store(self, vectors: dict[str, list[float]]):
+        if not vectors:
+            return
+
+        now = time.time()
+        rows = []
+        for text_hash, vector in vectors.items():
+            blob = array("f", vector).tobytes()
+            rows.append((self.model, text_hash, blob, len(blob), now))
+
+        with self._lock:
+            # Rows another request stored in the meantime are left alone and not counted twice
+            for row in rows:
+                if self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    row,
+                ).rowcount:
+                    self._total_bytes += row[3]
+            if self._total_bytes > self.max_bytes:
+                self._evict(self._total_bytes - self.max_bytes)
+                # Other processes sharing the file add rows too; the exact size is re-read here
+                self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+            self._conn.commit()
+
+    def _evict(self, excess: int):
+        evicted, freed = [], 0
+        for rowid, size in self._conn.execute("SELECT rowid, size FROM embeddings ORDER BY last_used"):
+            if freed >= excess:
+                break
+            evicted.append((rowid,))
+            freed += size
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", evicted)
+
+    def _split(self, texts: list[str]) -> tuple[list[str], dict[str, list[float]], dict[str, str]]:
+        hashes = [self._hash(text) for text in texts]
+        cached = self._lookup(list(dict.fromkeys(hashes)))
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in cached:
+                missing.setdefault(text_hash, text)
+        return hashes, cached, missing
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes, cached, missing = self._split(texts)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            cached.update(fresh)
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> list[float]:
+        hashes, cached, missing = self._split([text])
+        if missing:
+            vector = self.embeddings.embed_query(text)
+            self._store({hashes[0]: vector})
+            return vector
+        return cached[hashes[0]]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        hashes, cached, missing = await asyncio.to_thread(self._split, texts)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self._store, fresh)
+            cached.update(fresh)
+        return [cached[text_hash] for text_hash in hashes]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        if self.query_cache is None:
+            return await self._aembed_query(text)
+        # Identical questions arriving together are embedded once
+        return await self.query_cache.get_or_set(f"{self.model}:{self._hash(text)}", lambda: self._aembed_query(text))
+
+    async def _aembed_query(self, text: str) -> list[float]:
+        hashes, cached, missing = await asyncio.to_thread(self._split, [text])
+        if missing:
+            vector = await self.embeddings.aembed_query(text)
+            await asyncio.to_thread(self._store, {hashes[0]: vector})
+            return vector
+        return cached[hashes[0]]
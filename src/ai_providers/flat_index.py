@@ -0,0 +1,414 @@
+import json
+import re
+import shutil
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+
+INITIAL_CAPACITY = 1024
+
+_OPERATORS = {
+    "$eq": lambda column, value: column == value,
+    "$ne": lambda column, value: column != value,
+    "$gt": lambda column, value: _compare(column, value, np.greater),
+    "$gte": lambda column, value: _compare(column, value, np.greater_equal),
+    "$lt": lambda column, value: _compare(column, value, np.less),
+    "$lte": lambda column, value: _compare(column, value, np.less_equal),
+    "$in": lambda column, value: _membership(column, value),
+    "$nin": lambda column, value: ~_membership(column, value),
+}
+
+
+def _membership(column: np.ndarray, values) -> np.ndarray:
+    values = set(values)
+    return np.array([item in values for item in column], dtype=bool)
+
+
+def _compare(column: np.ndarray, value, op) -> np.ndarray:
+    present = np.array([item is not None for item in column], dtype=bool)
+    result = np.zeros(len(column), dtype=bool)
+    if present.any():
+        result[present] = op(column[present].astype(type(value)), value)
+    return result
+
+
+# A Chroma-compatible collection on plain files: vectors in a memory-mapped float32 matrix,
+# ids, documents and metadata in SQLite. Search is an exact scan over the rows that pass
+# the metadata filter, which is fast enough for the notebook sizes small deployments have.
+class FlatCollection:
+    def __init__(self, name: str, path: Path):
+        self.name = name
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+
+        self._db = sqlite3.connect(self.path / "records.sqlite3", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT, metadata TEXT NOT NULL)"
+        )
+        self._db.commit()
+
+        info_path = self.path / "info.json"
+        info = json.loads(info_path.read_text()) if info_path.exists() else {}
+        self.dimension: Optional[int] = info.get("dimension")
+        self._capacity: int = info.get("capacity", 0)
+        self._vectors: Optional[np.memmap] = None
+        if self.dimension:
+            self._vectors = self._open_vectors("r+")
+
+        self._ids: dict[str, int] = {}
+        self._rows: list[Optional[str]] = []
+        self._metadatas: list[Optional[dict]] = []
+        for row, record_id, metadata in self._db.execute("SELECT row, id, metadata FROM records ORDER BY row"):
+            self._set_row(row, record_id, json.loads(metadata))
+        self._columns: dict[str, np.ndarray] = {}
+
+    def _open_vectors(self, mode: str) -> np.memmap:
+        return np.memmap(self.path / "vectors.f32", dtype=np.float32, mode=mode, shape=(self._capacity, self.dimension))
+
+    def _save_info(self):
+        (self.path / "info.json").write_text(json.dumps({"dimension": self.dimension, "capacity": self._capacity}))
+
+    def _set_row(self, row: int, record_id: Optional[str], metadata: Optional[dict]):
+        while len(self._rows) <= row:
+            self._rows.append(None)
+            self._metadatas.append(None)
+        self._rows[row] = record_id
+        self._metadatas[row] = metadata
+        if record_id is not None:
+            self._ids[record_id] = row
+
+    def _ensure_capacity(self, rows: int, dimension: int):
+        if self.dimension is None:
+            self.dimension = dimension
+        elif dimension != self.dimension:
+            raise ValueError(f"Embedding dimension {dimension} does not match collection dimension {self.dimension}")
+        if rows <= self._capacity:
+            return
+
+        capacity = max(self._capacity, INITIAL_CAPACITY)
+        while capacity < rows:
+            capacity *= 2
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with open(self.path / "vectors.f32", "ab") as file:
+            file.truncate(capacity * self.dimension * 4)
+        self._capacity = capacity
+        self._vectors = self._open_vectors("r+")
+        self._save_info()
+
+    def _column(self, field: str) -> np.ndarray:
+        column = self._columns.get(field)
+        if column is None:
+            column = np.empty(len(self._rows), dtype=object)
+            for row, metadata in enumerate(self._metadatas):
+                column[row] = metadata.get(field) if metadata else None
+            self._columns[field] = column
+        return column
+
+    def _mask(self, where: Optional[dict]) -> np.ndarray:
+        live = np.array([record_id is not None for record_id in self._rows], dtype=bool)
+        return live & self._where_mask(where) if where else live
+
+    def _where_mask(self, where: dict) -> np.ndarray:
+        mask = np.ones(len(self._rows), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._where_mask(clause)
+            elif key == "$or":
+                any_mask = np.zeros(len(self._rows), dtype=bool)
+                for clause in condition:
+                    any_mask |= self._where_mask(clause)
+                mask &= any_mask
+            else:
+                column = self._column(key)
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                for operator, value in condition.items():
+                    if operator not in _OPERATORS:
+                        raise ValueError(f"Unsupported filter operator: {operator}")
+                    mask &= np.asarray(_OPERATORS[operator](column, value), dtype=bool)
+        return mask
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def upsert(
+        self,
+        ids: list[str],
+        embeddings: list,
+        documents: Optional[list[str]] = None,
+        metadatas: Optional[list[dict]] = None,
+    ):
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+
+        with self._lock:
+            free_rows = []
+            if len(self._ids) < len(self._rows):
+                free_rows = [row for row, record_id in enumerate(self._rows) if record_id is None]
+            next_row = len(self._rows)
+            assigned: dict[str, int] = {}
+            rows = []
+            for record_id in ids:
+                row = self._ids.get(record_id, assigned.get(record_id))
+                if row is None:
+                    if free_rows:
+                        row = free_rows.pop(0)
+                    else:
+                        row, next_row = next_row, next_row + 1
+                assigned[record_id] = row
+                rows.append(row)
+
+            self._ensure_capacity(max(rows) + 1, vectors.shape[1])
+            self._vectors[rows] = vectors
+            self._vectors.flush()
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO records (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (row, record_id, document, json.dumps(metadata, ensure_ascii=False))
+                    for row, record_id, document, metadata in zip(rows, ids, documents, metadatas)
+                ],
+            )
+            self._db.commit()
+            for row, record_id, metadata in zip(rows, ids, metadatas):
+                self._set_row(row, record_id, dict(metadata))
+            self._columns.clear()
+
+    add = upsert
+
+    def delete(self, ids: Optional[list[str]] = None, where: Optional[dict] = None):
+        with self._lock:
+            if ids is not None:
+                rows = [self._ids[record_id] for record_id in ids if record_id in self._ids]
+                if where:
+                    mask = self._mask(where)
+                    rows = [row for row in rows if mask[row]]
+            else:
+                rows = np.flatnonzero(self._mask(where)).tolist()
+            if not rows:
+                return
+
+            self._db.executemany("DELETE FROM records WHERE row = ?", [(row,) for row in rows])
+            self._db.commit()
+            for row in rows:
+                del self._ids[self._rows[row]]
+                self._set_row(row, None, None)
+            self._columns.clear()
+
+    def _fetch(self, rows: list[int], include: list[str]) -> dict:
+        result = {"ids": [self._rows[row] for row in rows], "embeddings": None, "documents": None, "metadatas": None}
+        if "embeddings" in include:
+            result["embeddings"] = np.array(self._vectors[rows]) if rows else np.empty((0, self.dimension or 0))
+        if "metadatas" in include:
+            result["metadatas"] = [dict(self._metadatas[row]) for row in rows]
+        if "documents" in include:
+            documents = {}
+            for start in range(0, len(rows), 500):
+                batch = rows[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                documents.update(self._db.execute(
+                    f"SELECT row, document FROM records WHERE row IN ({placeholders})", batch
+                ).fetchall())
+            result["documents"] = [documents.get(row) for row in rows]
+        return result
+
+    def get(
+        self,
+        ids: Optional[list[str]] = None,
+        where: Optional[dict] = None,
+        include: Optional[list[str]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+    ) -> dict:
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            mask = self._mask(where)
+            if ids is not None:
+                rows = [self._ids[record_id] for record_id in ids if record_id in self._ids and mask[self._ids[record_id]]]
+            else:
+                rows = np.flatnonzero(mask).tolist()
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+            return self._fetch(rows, include)
+
+    def query(
+        self,
+        query_embeddings: list,
+        n_results: int = 10,
+        where: Optional[dict] = None,
+        include: Optional[list[str]] = None,
+    ) -> dict:
+        # Squared L2 distance, the same space Chroma collections use by default
+        include = ["documents", "metadatas", "distances"] if include is None else include
+        results = {"ids": [], "embeddings": [], "documents": [], "metadatas": [], "distances": []}
+        with self._lock:
+            rows = np.flatnonzero(self._mask(where))
+            for query in np.asarray(query_embeddings, dtype=np.float32):
+                if len(rows):
+                    distances = ((self._vectors[rows] - query) ** 2).sum(axis=1)
+                    top = np.argsort(distances)[:n_results]
+                    selected, selected_distances = rows[top].tolist(), distances[top].tolist()
+                else:
+                    selected, selected_distances = [], []
+                fetched = self._fetch(selected, include)
+                for key in ("ids", "embeddings", "documents", "metadatas"):
+                    results[key].append(fetched[key])
+                results["distances"].append(selected_distances)
+        return results
+
+
+class FlatIndexClient:
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._collections: dict[str, FlatCollection] = {}
+
+    def _collection_path(self, name: str) -> Path:
+        if not re.fullmatch(r"[\w.-]+", name):
+            raise ValueError(f"Invalid collection name: {name}")
+        return self.path / name
+
+    def get_or_create_collection(self, name: str, **kwargs) -> FlatCollection:
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = FlatCollection(name, self._collection_path(name))
+            return collection
+
+    def get_collection(self, name: str, **kwargs) -> FlatCollection:
+        if name not in self._collections and not self._collection_path(name).exists():
+            raise ValueError(f"Collection {name} does not exist.")
+        return self.get_or_create_collection(name)
+
+    def list_collections(self) -> list[str]:
+        return sorted(path.name for path in self.path.iterdir() if path.is_dir())
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(self._collection_path(name), ignore_errors=True)
+
+    def heartbeat(self) -> int:
+        return 0
+
+
+class FlatVectorStore(VectorStore):
+    def __init__(self, collection: FlatCollection, embedding_function: Embeddings):
+        self._collection = collection
+        self._embedding_function = embedding_function
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        embeddings = self._embedding_function.embed_documents(texts)
+        self._collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+        return ids
+
+    @staticmethod
+    def _documents(results: dict) -> list[Document]:
+        return [
+            Document(id=record_id, page_content=document or "", metadata=metadata or {})
+            for record_id, document, metadata in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+        ]
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> list[Document]:
+        return self._documents(self._collection.query([embedding], n_results=k, where=filter))
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> list[Document]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k=k, filter=filter)
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        embedding = self._embedding_function.embed_query(query)
+        results = self._collection.query([embedding], n_results=k, where=filter)
+        return list(zip(self._documents(results), results["distances"][0]))
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        results = self._collection.query(
+            [embedding],
+            n_results=fetch_k,
+            where=filter,
+            include=["embeddings", "documents", "metadatas"],
+        )
+        if not results["ids"][0]:
+            return []
+        selected = maximal_marginal_relevance(
+            np.array(embedding, dtype=np.float32),
+            results["embeddings"][0],
+            k=k,
+            lambda_mult=lambda_mult,
+        )
+        candidates = self._documents(results)
+        return [candidates[index] for index in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> list[Document]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, filter)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: Optional[list[dict]] = None,
+        *,
+        ids: Optional[list[str]] = None,
+        collection: Optional[FlatCollection] = None,
+        **kwargs: Any,
+    ) -> "FlatVectorStore":
+        if collection is None:
+            raise ValueError("FlatVectorStore.from_texts needs a collection.")
+        store = cls(collection, embedding)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
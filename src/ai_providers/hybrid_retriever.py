@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+
+def chunk_key(doc: Document) -> tuple:
+    return doc.metadata.get("source_id"), doc.metadata.get("chunk_index")
+
+
+def reciprocal_rank_fusion(rankings: list[list[Document]], k: int, rrf_k: int = 60) -> list[Document]:
+    scores: dict[tuple, float] = {}
+    documents: dict[tuple, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1 / (rrf_k + rank + 1)
+            documents.setdefault(key, doc)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in ranked]
+
+
+# Dense results from Chroma fused with the notebook's BM25 index, so exact identifiers and
+# rare terms that embeddings blur still make it into the context.
+class HybridRetriever(BaseRetriever):
+    vector_retriever: BaseRetriever
+    vector_service: Any
+    notebook_id: int
+    source_ids: Optional[list[int]] = None
+    k: int = 5
+    fetch_k: int = 20
+
+    def _lexical_search(self, query: str) -> list[Document]:
+        self.vector_service.ensure_lexical_index(self.notebook_id)
+        return self.vector_service.lexical_index.search(
+            self.notebook_id, query, k=self.fetch_k, source_ids=self.source_ids
+        )
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        dense = self.vector_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return reciprocal_rank_fusion([dense, self._lexical_search(query)], k=self.k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        dense, lexical = await asyncio.gather(
+            self.vector_retriever.ainvoke(query, config={"callbacks": run_manager.get_child()}),
+            run_in_threadpool(self._lexical_search, query),
+        )
+        return reciprocal_rank_fusion([dense, lexical], k=self.k)
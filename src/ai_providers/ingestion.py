@@ -1,35 +1,301 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from src.ai_providers.pdf_parsing import count_pages, parse_page_range
 from src.ai_providers.vector_store import VectorService
+from src.config import settings
 
 from fastapi.concurrency import run_in_threadpool
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, Optional[int]], Awaitable[None]]
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    # One pool per application process, shared by all uploads
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=settings.PDF_PARSE_WORKERS or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _parse_pool
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+async def iter_pdf_chunks(file_path: str) -> AsyncIterator[list[Document]]:
+    # Page ranges are parsed and split in the process pool. Each upload keeps only a few
+    # ranges queued at a time so concurrent uploads interleave on the shared workers;
+    # results are consumed in submission order, which keeps chunk order stable.
+    loop = asyncio.get_running_loop()
+    pool = get_parse_pool()
+    total_pages = await run_in_threadpool(count_pages, file_path)
+    step = settings.PDF_PAGES_PER_TASK
+    ranges = iter(range(0, total_pages, step))
+    pending = deque()
+
+    def submit_next():
+        start = next(ranges, None)
+        if start is not None:
+            end = min(start + step, total_pages)
+            pending.append(loop.run_in_executor(pool, parse_page_range, file_path, start, end))
+
+    for _ in range(settings.PDF_PARSE_WINDOW):
+        submit_next()
+
+    try:
+        while pending:
+            splits = await pending.popleft()
+            submit_next()
+            yield splits
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# The stored file path changes with every replace while the chunk itself does not
+PATH_METADATA_KEYS = ("source",)
+
+
+def comparable_metadata(metadata: dict) -> dict:
+    return {key: value for key, value in metadata.items() if key not in PATH_METADATA_KEYS}
+
+
+def chunk_id(source_id: int, text: str, occurrence: int) -> str:
+    # Content-addressed, so re-indexing a changed file keeps the vectors of unchanged chunks.
+    # Identical chunks within one source are told apart by their occurrence number.
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+    return f"source_{source_id}_{digest}_{occurrence}"
+
+
+async def load_stored_chunks(notebook_id: int, source_id: int, vector_service: VectorService) -> dict[str, tuple]:
+    # (stored id, metadata) of the chunks already indexed for the source, keyed by content id.
+    # Chunks stored under the old positional ids are matched by their text the same way.
+    records = await vector_service.aget_source_records(
+        notebook_id, source_id, include=["documents", "metadatas"]
+    )
+    stored = sorted(
+        zip(records["ids"], records["documents"], records["metadatas"]),
+        key=lambda record: record[2].get("chunk_index", 0),
+    )
+    occurrences = Counter()
+    chunks = {}
+    for stored_id, text, metadata in stored:
+        content_id = chunk_id(source_id, text, occurrences[text])
+        occurrences[text] += 1
+        chunks[content_id] = (stored_id, metadata)
+    return chunks
+
+
+async def delete_stale_chunks(notebook_id: int, ids: set[str], vector_service: VectorService):
+    ids = sorted(ids)
+    batch_size = settings.INGESTION_BATCH_SIZE * 16
+    for start in range(0, len(ids), batch_size):
+        await vector_service.adelete_records(notebook_id, ids=ids[start:start + batch_size])
 
 
 async def process_pdf_to_vectorstore(
-    file_path: str, 
-    notebook_id: int, 
-    source_id: int, 
-    vector_service: VectorService
+    file_path: str,
+    notebook_id: int,
+    source_id: int,
+    vector_service: VectorService,
+    progress_callback: Optional[ProgressCallback] = None,
+    resume_from: int = 0,
 ):
-    loader = PyPDFLoader(file_path)
-    documents = await run_in_threadpool(loader.load)
+    # Page ranges are parsed as they are needed; full batches go through a bounded
+    # queue, so at most INGESTION_MAX_INFLIGHT_BATCHES batches are held in memory.
+    # Batches entirely below resume_from were stored by a previous attempt and are skipped.
+    # Only chunks whose text is not stored yet are embedded; stored ones are rewritten when
+    # their position or metadata moved, and whatever the file no longer contains is deleted.
+    batches: asyncio.Queue = asyncio.Queue(maxsize=settings.INGESTION_MAX_INFLIGHT_BATCHES)
+    batch_size = settings.INGESTION_BATCH_SIZE
+    total = None
+    stored = await load_stored_chunks(notebook_id, source_id, vector_service)
+    stats = Counter()
+
+    async def produce():
+        nonlocal total
+        chunk_index = 0
+        occurrences = Counter()
+        batch = []
+        try:
+            async with aclosing(iter_pdf_chunks(file_path)) as chunks:
+                async for splits in chunks:
+                    for split in splits:
+                        split.metadata["notebook_id"] = notebook_id
+                        split.metadata["source_id"] = source_id
+                        split.metadata["chunk_index"] = chunk_index
+                        split.id = chunk_id(source_id, split.page_content, occurrences[split.page_content])
+                        occurrences[split.page_content] += 1
+                        chunk_index += 1
+                        batch.append(split)
+
+                        if len(batch) == batch_size:
+                            await batches.put(batch)
+                            batch = []
+            if batch:
+                await batches.put(batch)
+        except Exception:
+            # Wake the consumer up; it re-raises the error when awaiting the producer
+            await batches.put(None)
+            raise
+
+        total = chunk_index
+        await batches.put(None)
+
+    # Batches are embedded by EMBEDDING_CONCURRENCY consumers and may finish out of order;
+    # the checkpoint only advances over the contiguous prefix of finished batches.
+    finished: dict[int, int] = {}
+    watermark = 0
+    seen: set[str] = set()
+
+    async def consume():
+        nonlocal watermark
+        while (batch := await batches.get()) is not None:
+            start = batch[0].metadata["chunk_index"]
+            end = start + len(batch)
+            seen.update(split.id for split in batch)
+            if end > resume_from:
+                await store_batch(batch)
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=100,
+            finished[start] = end
+            while watermark in finished:
+                watermark = finished.pop(watermark)
+            if progress_callback:
+                await progress_callback(watermark, total)
+
+        # Let the other consumers see the end of the stream too
+        await batches.put(None)
+
+    async def store_batch(batch: list[Document]):
+        new = [split for split in batch if split.id not in stored]
+        # Stored under another id or at another position: the stored vector is written again
+        moved = [
+            split for split in batch
+            if split.id in stored
+            and (stored[split.id][0] != split.id
+                 or comparable_metadata(stored[split.id][1]) != comparable_metadata(split.metadata))
+        ]
+        stats.update(embedded=len(new), reused=len(batch) - len(new))
+        if not new and not moved:
+            return
+
+        vectors = {}
+        if moved:
+            records = await vector_service.aget_records(
+                notebook_id, ids=[stored[split.id][0] for split in moved], include=["embeddings"]
+            )
+            # Chroma hands embeddings back as arrays; they are mixed with fresh lists below
+            vectors = {
+                stored_id: list(map(float, vector))
+                for stored_id, vector in zip(records["ids"], records["embeddings"])
+            }
+        splits = [split for split in moved if stored[split.id][0] in vectors]
+        embeddings = [vectors[stored[split.id][0]] for split in splits]
+        # A stored vector that vanished in the meantime is simply embedded again
+        new += [split for split in moved if stored[split.id][0] not in vectors]
+        if new:
+            embeddings += await vector_service.embeddings.aembed_documents([split.page_content for split in new])
+        splits += new
+
+        await vector_service.aupsert_records(
+            notebook_id,
+            ids=[split.id for split in splits],
+            embeddings=embeddings,
+            documents=[split.page_content for split in splits],
+            metadatas=[split.metadata for split in splits],
+        )
+
+    producer = asyncio.create_task(produce())
+    consumers = [asyncio.create_task(consume()) for _ in range(settings.EMBEDDING_CONCURRENCY)]
+    try:
+        await asyncio.gather(*consumers)
+        await producer
+    finally:
+        for task in (producer, *consumers):
+            task.cancel()
+
+    # Only after the whole file went through, so a failed run never loses stored chunks
+    stale = {stored_id for stored_id, _ in stored.values()} - seen
+    await delete_stale_chunks(notebook_id, stale, vector_service)
+    logger.info(
+        "Indexed source %s: %s chunks embedded, %s reused, %s deleted",
+        source_id, stats["embedded"], stats["reused"], len(stale),
     )
-    splits = await run_in_threadpool(text_splitter.split_documents, documents)
 
-    for i, split in enumerate(splits):
-        split.metadata["notebook_id"] = notebook_id
-        split.metadata["source_id"] = source_id
-        split.metadata["chunk_index"] = i
+    if progress_callback:
+        await progress_callback(total, total)
+
+    return total
+
+
+async def copy_source_vectors(
+    from_notebook_id: int,
+    from_source_id: int,
+    file_path: str,
+    notebook_id: int,
+    source_id: int,
+    vector_service: VectorService,
+    progress_callback: Optional[ProgressCallback] = None,
+):
+    # Reuses chunks and embeddings of an already indexed identical file instead of re-embedding it
+    existing = await vector_service.aget_source_records(from_notebook_id, from_source_id, include=[])
+    total = len(existing["ids"])
+    if not total:
+        return 0
+    # The source may be a replaced file that still has chunks of its previous content
+    previous = await vector_service.aget_source_records(notebook_id, source_id, include=[])
+    occurrences = Counter()
+    seen = set()
 
-    ids = [f"source_{source_id}_chunk_{i}" for i in range(len(splits))]
-    print(ids)
+    batch_size = settings.INGESTION_BATCH_SIZE
+    for offset in range(0, total, batch_size):
+        records = await vector_service.aget_source_records(
+            from_notebook_id,
+            from_source_id,
+            limit=batch_size,
+            offset=offset,
+        )
 
-    db = vector_service.get_collection(notebook_id)
+        metadatas = []
+        ids = []
+        for text, metadata in zip(records["documents"], records["metadatas"]):
+            metadata = dict(metadata)
+            metadata["notebook_id"] = notebook_id
+            metadata["source_id"] = source_id
+            metadata["source"] = file_path
+            metadatas.append(metadata)
+            ids.append(chunk_id(source_id, text, occurrences[text]))
+            occurrences[text] += 1
+        seen.update(ids)
 
-    await run_in_threadpool(db.add_documents, documents=splits, ids=ids)
+        await vector_service.aupsert_records(
+            notebook_id,
+            ids=ids,
+            embeddings=records["embeddings"],
+            documents=records["documents"],
+            metadatas=metadatas,
+        )
+        if progress_callback:
+            await progress_callback(min(offset + batch_size, total), total)
 
-    return len(splits)
\ No newline at end of file
+    await delete_stale_chunks(notebook_id, set(previous["ids"]) - seen, vector_service)
+    return total
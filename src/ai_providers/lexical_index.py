@@ -0,0 +1,245 @@
+import fcntl
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from langchain_core.documents import Document
+
+
+# Identifiers like "XR-200/b" or "v1.2.3" are kept whole, their parts are indexed as well
+TOKEN_PATTERN = re.compile(r"\w+(?:[-./]\w+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if len(parts := re.findall(r"\w+", match)) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: dict[str, tuple[str, dict]] = {}
+        self.lengths: dict[str, int] = {}
+        self.postings: dict[str, dict[str, int]] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, chunk_id: str, text: str, metadata: dict):
+        if chunk_id in self.documents:
+            self.remove(chunk_id)
+
+        counts = Counter(tokenize(text))
+        for term, frequency in counts.items():
+            self.postings.setdefault(term, {})[chunk_id] = frequency
+        self.documents[chunk_id] = (text, metadata)
+        self.lengths[chunk_id] = sum(counts.values())
+        self.total_length += self.lengths[chunk_id]
+
+    def remove(self, chunk_id: str):
+        if chunk_id not in self.documents:
+            return
+
+        text, _ = self.documents.pop(chunk_id)
+        for term in set(tokenize(text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(chunk_id)
+
+    def search(self, query: str, k: int, source_ids: Optional[list[int]] = None) -> list[tuple[str, float]]:
+        if not self.documents:
+            return []
+
+        allowed = set(source_ids) if source_ids else None
+        average_length = self.total_length / len(self.documents) or 1
+        scores: dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                if allowed is not None and self.documents[chunk_id][1].get("source_id") not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def get_document(self, chunk_id: str) -> Document:
+        text, metadata = self.documents[chunk_id]
+        return Document(id=chunk_id, page_content=text, metadata=metadata)
+
+
+@dataclass
+class _LogPosition:
+    inode: int = 0
+    offset: int = 0
+    operations: int = 0
+
+
+def _apply(index: BM25Index, entry: dict):
+    if entry["op"] == "add":
+        index.add(entry["id"], entry["text"], entry["metadata"])
+    else:
+        index.remove(entry["id"])
+
+
+def _encode(entry: dict) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# One BM25 index per notebook, kept in memory and persisted as an append-only JSONL log
+# of add/remove operations. The log is rewritten as a snapshot when it holds more than
+# twice as many operations as there are live chunks. Only recently used notebooks stay in
+# memory, bounded by max_notebooks and max_chunks; evicted ones are reloaded from their log.
+#
+# Every API worker shares the same logs. Writers take an exclusive flock on the notebook's
+# .lock file and catch up with the log before appending or compacting, so no worker's
+# entries are lost. Readers catch up with whatever was appended since their last read, and
+# reload from scratch when another worker replaced the log with a snapshot.
+class LexicalIndexStore:
+    def __init__(self, directory: str, max_notebooks: int, max_chunks: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_notebooks = max_notebooks
+        self.max_chunks = max_chunks
+        self._lock = threading.RLock()
+        self._indexes: OrderedDict[int, BM25Index] = OrderedDict()
+        self._positions: dict[int, _LogPosition] = {}
+
+    def _path(self, notebook_id: int) -> Path:
+        return self.directory / f"notebook_{notebook_id}.jsonl"
+
+    @contextmanager
+    def _file_lock(self, notebook_id: int):
+        with (self.directory / f"notebook_{notebook_id}.lock").open("a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield
+
+    def exists(self, notebook_id: int) -> bool:
+        return notebook_id in self._indexes or self._path(notebook_id).exists()
+
+    def get(self, notebook_id: int) -> BM25Index:
+        with self._lock:
+            index = self._indexes.get(notebook_id)
+            loaded = index is None
+            if loaded:
+                index = BM25Index()
+                self._positions[notebook_id] = _LogPosition()
+            self._indexes[notebook_id] = index = self._read(notebook_id, index)
+            self._indexes.move_to_end(notebook_id)
+            if loaded:
+                self._evict()
+            return index
+
+    def _evict(self):
+        # Least recently used first; the most recent notebook always stays, however large
+        total_chunks = sum(len(index) for index in self._indexes.values())
+        while len(self._indexes) > 1 and (
+            len(self._indexes) > self.max_notebooks or total_chunks > self.max_chunks
+        ):
+            notebook_id, index = self._indexes.popitem(last=False)
+            self._positions.pop(notebook_id, None)
+            total_chunks -= len(index)
+
+    def _read(self, notebook_id: int, index: BM25Index) -> BM25Index:
+        # Applies the log entries past the last read position; returns a fresh index when
+        # the log was compacted in the meantime
+        position = self._positions[notebook_id]
+        try:
+            log = self._path(notebook_id).open("rb")
+        except FileNotFoundError:
+            return index
+        with log:
+            stat = os.fstat(log.fileno())
+            if stat.st_ino == position.inode and stat.st_size == position.offset:
+                return index
+            if stat.st_ino != position.inode or stat.st_size < position.offset:
+                index = BM25Index()
+                position = self._positions[notebook_id] = _LogPosition(inode=stat.st_ino)
+
+            log.seek(position.offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    # Torn write, or another worker is still writing it
+                    break
+                position.offset += len(line)
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                _apply(index, entry)
+                position.operations += 1
+        return index
+
+    def _write(self, notebook_id: int, entries: list[dict]):
+        # Called with the file lock held and the index caught up with the log
+        index = self._indexes[notebook_id]
+        for entry in entries:
+            _apply(index, entry)
+        with self._path(notebook_id).open("ab") as log:
+            for entry in entries:
+                log.write(_encode(entry))
+            position = self._positions[notebook_id]
+            position.inode = os.fstat(log.fileno()).st_ino
+            position.offset = log.tell()
+        position.operations += len(entries)
+
+        if position.operations > 2 * max(len(index), 1000):
+            self._compact(notebook_id)
+
+    def _compact(self, notebook_id: int):
+        index = self._indexes[notebook_id]
+        path = self._path(notebook_id)
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("wb") as log:
+            for chunk_id, (text, metadata) in index.documents.items():
+                log.write(_encode({"op": "add", "id": chunk_id, "text": text, "metadata": metadata}))
+            position = _LogPosition(os.fstat(log.fileno()).st_ino, log.tell(), len(index))
+        tmp_path.replace(path)
+        self._positions[notebook_id] = position
+
+    def add(self, notebook_id: int, ids: list[str], documents: list[str], metadatas: list[dict]):
+        with self._lock, self._file_lock(notebook_id):
+            self.get(notebook_id)
+            self._write(notebook_id, [
+                {"op": "add", "id": chunk_id, "text": text, "metadata": metadata}
+                for chunk_id, text, metadata in zip(ids, documents, metadatas)
+            ])
+            self._evict()
+
+    def remove(self, notebook_id: int, ids: list[str]):
+        with self._lock, self._file_lock(notebook_id):
+            index = self.get(notebook_id)
+            ids = [chunk_id for chunk_id in ids if chunk_id in index.documents]
+            if ids:
+                self._write(notebook_id, [{"op": "remove", "id": chunk_id} for chunk_id in ids])
+
+    def search(
+        self,
+        notebook_id: int,
+        query: str,
+        k: int,
+        source_ids: Optional[list[int]] = None,
+    ) -> list[Document]:
+        with self._lock:
+            index = self.get(notebook_id)
+            return [index.get_document(chunk_id) for chunk_id, _ in index.search(query, k, source_ids)]
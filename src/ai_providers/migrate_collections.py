@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import logging
+
+from src.config import settings
+from src.database import SessionLocal
+from src.notebooks.models import Notebook
+from .collection_layout import LAYOUTS, CollectionLayout, collection_names, move_notebook_vectors
+from .vector_store import create_vector_client
+
+from sqlalchemy.future import select
+
+
+logger = logging.getLogger(__name__)
+
+
+async def load_notebook_owners() -> dict[int, int]:
+    async with SessionLocal() as db:
+        result = await db.execute(select(Notebook.id, Notebook.user_id))
+        return {notebook_id: user_id for notebook_id, user_id in result.all()}
+
+
+def migrate_collections(
+    client,
+    notebook_owners: dict[int, int],
+    from_layout: CollectionLayout,
+    to_layout: CollectionLayout,
+    batch_size: int,
+    dry_run: bool = False,
+) -> int:
+    existing = collection_names(client)
+    emptied = set()
+    moved_total = 0
+    for notebook_id, owner_id in sorted(notebook_owners.items()):
+        from_name = from_layout.collection_name(notebook_id, owner_id)
+        to_name = to_layout.collection_name(notebook_id, owner_id)
+        if from_name == to_name or from_name not in existing:
+            continue
+        if dry_run:
+            logger.info("Notebook %s: %s -> %s", notebook_id, from_name, to_name)
+            continue
+
+        moved = move_notebook_vectors(client, notebook_id, from_name, to_name, batch_size)
+        moved_total += moved
+        emptied.add(from_name)
+        logger.info("Notebook %s: moved %s chunks from %s to %s", notebook_id, moved, from_name, to_name)
+
+    # Only collections nothing is left in are dropped; chunks of notebooks that no longer
+    # exist in the database stay where they are
+    for name in sorted(emptied):
+        if client.get_collection(name).count() == 0:
+            client.delete_collection(name)
+            logger.info("Dropped empty collection %s", name)
+    return moved_total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move stored vectors between collection layouts without re-embedding. "
+        "Run it while the app is stopped, then set VECTOR_COLLECTION_LAYOUT to the new layout."
+    )
+    parser.add_argument("--from", dest="from_layout", choices=LAYOUTS, required=True)
+    parser.add_argument("--to", dest="to_layout", choices=LAYOUTS, default=settings.VECTOR_COLLECTION_LAYOUT)
+    parser.add_argument("--from-shards", type=int, default=settings.VECTOR_COLLECTION_SHARDS)
+    parser.add_argument("--to-shards", type=int, default=settings.VECTOR_COLLECTION_SHARDS)
+    parser.add_argument("--batch-size", type=int, default=settings.INGESTION_BATCH_SIZE * 16)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from_layout = CollectionLayout(args.from_layout, args.from_shards)
+    to_layout = CollectionLayout(args.to_layout, args.to_shards)
+    if (from_layout.kind, from_layout.shards) == (to_layout.kind, to_layout.shards):
+        parser.error("--from and --to describe the same layout")
+
+    notebook_owners = asyncio.run(load_notebook_owners())
+    moved = migrate_collections(
+        create_vector_client(), notebook_owners, from_layout, to_layout, args.batch_size, args.dry_run
+    )
+    logger.info("Moved %s chunks of %s notebooks", moved, len(notebook_owners))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# Runs inside the ingestion process pool, so keep imports light: every worker
+# process imports this module on start-up.
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
+
+def count_pages(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def parse_page_range(file_path: str, start: int, end: int) -> list[Document]:
+    reader = PdfReader(file_path)
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+    )
+
+    # pypdf rebuilds the label list on every access, so it is read once per range
+    labels = reader.page_labels
+    total_pages = len(reader.pages)
+
+    pages = []
+    for page_number in range(start, end):
+        pages.append(
+            Document(
+                page_content=reader.pages[page_number].extract_text().strip(),
+                metadata={
+                    "source": file_path,
+                    "total_pages": total_pages,
+                    "page": page_number,
+                    "page_label": labels[page_number],
+                },
+            )
+        )
+    return text_splitter.split_documents(pages)
@@ -1,6 +1,6 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-from .constants import SYSTEM_INSTRUCTION, REPHRASE_SYSTEM_INSTRUCTION
+from .constants import SYSTEM_INSTRUCTION, REPHRASE_SYSTEM_INSTRUCTION, SUMMARY_SYSTEM_INSTRUCTION
 
 # Standalone question rephrasing prompt
 rephrase_prompt = ChatPromptTemplate.from_messages([
@@ -14,4 +14,10 @@ qa_prompt = ChatPromptTemplate.from_messages([
     ("system", SYSTEM_INSTRUCTION), 
     MessagesPlaceholder(variable_name="chat_history"),
     ("human", "{question}")
-])
\ No newline at end of file
+])
+
+# Rolling conversation summary prompt
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", SUMMARY_SYSTEM_INSTRUCTION),
+    ("human", "Current summary:\n{summary}\n\nNew messages:\n{messages}"),
+])
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import math
+import random
+import threading
+import time
+
+from .tokens import count_tokens
+
+import openai
+from langchain_core.embeddings import Embeddings
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: int, now: float) -> float:
+        if self.per_minute <= 0:
+            return 0.0
+
+        self.level = min(self.per_minute, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+
+# Token buckets for requests and tokens per minute. Callers reserve capacity up front
+# and sleep until it is available, so the limiter works for both threads and coroutines.
+class RateLimiter:
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self._lock = threading.Lock()
+        self._requests = _Bucket(requests_per_minute)
+        self._tokens = _Bucket(tokens_per_minute)
+
+    def _reserve(self, requests: int, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            return max(self._requests.reserve(requests, now), self._tokens.reserve(tokens, now))
+
+    async def acquire(self, requests: int = 1, tokens: int = 0):
+        delay = self._reserve(requests, tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self, requests: int = 1, tokens: int = 0):
+        delay = self._reserve(requests, tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+
+# The wrapped OpenAI client is built with max_retries=0, so these are retried here only, each
+# attempt going through the rate limiter again
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def _retry_delay(error: openai.APIError, attempt: int) -> float:
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+
+
+class RateLimitedEmbeddings(Embeddings):
+    def __init__(self, embeddings: Embeddings, limiter: RateLimiter, model: str, max_retries: int, batch_size: int):
+        self.embeddings = embeddings
+        self.limiter = limiter
+        self.model = model
+        self.max_retries = max_retries
+        self.batch_size = batch_size
+
+    def _cost(self, texts: list[str]) -> tuple[int, int]:
+        requests = max(1, math.ceil(len(texts) / self.batch_size))
+        tokens = sum(count_tokens(text, self.model) for text in texts)
+        return requests, tokens
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        requests, tokens = self._cost(texts)
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire_sync(requests, tokens)
+            try:
+                return self.embeddings.embed_documents(texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_delay(e, attempt)
+                logger.warning("Embedding request failed (%s), retrying in %.1fs", type(e).__name__, delay)
+                time.sleep(delay)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        # Tokenizing a batch of up to EMBEDDING_BATCH_SIZE chunks takes long enough to stall the loop
+        requests, tokens = await asyncio.to_thread(self._cost, texts)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(requests, tokens)
+            try:
+                return await self.embeddings.aembed_documents(texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_delay(e, attempt)
+                logger.warning("Embedding request failed (%s), retrying in %.1fs", type(e).__name__, delay)
+                await asyncio.sleep(delay)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self.aembed_documents([text]))[0]
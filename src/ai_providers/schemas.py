@@ -1,10 +1,22 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 
 class Citiation(BaseModel):
     source_id: int
     page: int 
     quote: str
 
+class AnswerMetadata(BaseModel):
+    cache_hit: bool = False
+    cache_similarity: Optional[float] = None
+    retrieval_strategy: Optional[str] = None
+    context_tokens: Optional[int] = None
+    timings: dict[str, float] = Field(default_factory=dict)
+
 class AskQuestionResponse(BaseModel):
     answer: str
-    citations: list[Citiation] = Field(default_factory=list)
\ No newline at end of file
+    citations: list[Citiation] = Field(default_factory=list)
+    # Filled in by the service, hidden from the schema the LLM has to produce
+    metadata: SkipJsonSchema[AnswerMetadata] = Field(default_factory=AnswerMetadata)
\ No newline at end of file
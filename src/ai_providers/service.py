@@ -1,46 +1,231 @@
+import asyncio
+import hashlib
+import re
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from src.cache import create_cache
+from src.config import settings
 from src.notebooks.schemas import QuestionRequest
 from .vector_store import VectorService
-from .schemas import AskQuestionResponse
-from .prompts import qa_prompt, rephrase_prompt
+from .answer_cache import normalize_question
+from .context_packing import format_block, pack_documents
+from .schemas import AnswerMetadata, AskQuestionResponse
+from .prompts import qa_prompt, rephrase_prompt, summary_prompt
 from src.users.models import User
 
 from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+
+# Words that usually point back into the conversation ("tell me more about it")
+FOLLOW_UP_MARKERS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their", "he", "she", "him", "her",
+    "more", "elaborate", "above", "previous", "same", "again", "continue", "else",
+    "це", "цього", "цьому", "цим", "він", "вона", "воно", "вони", "його", "її", "їх",
+    "детальніше", "більше", "далі", "продовж", "продовжуй", "ще",
+}
+
+
+class StageTimer:
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+        self.strategy: Optional[str] = None
+        self._started = time.perf_counter()
 
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def finish(self) -> dict[str, float]:
+        self.timings["total_ms"] = round((time.perf_counter() - self._started) * 1000, 1)
+        return self.timings
+
+
+def _words(text: str) -> set[str]:
+    return set(re.findall(r"\w+", text.lower()))
+
+def is_standalone_question(question: str, chat_history: list) -> bool:
+    if not chat_history:
+        return True
+    words = _words(question)
+    return len(words) >= 4 and not (words & FOLLOW_UP_MARKERS)
+
+def query_overlap(first: str, second: str) -> float:
+    first_words, second_words = _words(first), _words(second)
+    if not first_words or not second_words:
+        return 0.0
+    return len(first_words & second_words) / len(first_words | second_words)
 
 def format_docs(docs: list[Document]) -> str:
-    formatted = []
-    for doc in docs:
-        s_id = doc.metadata.get("source_id", "N/A")
-        page = doc.metadata.get("page", "?") + 1
-        content = doc.page_content.replace("\n", " ").strip()
-        formatted.append(f"[Source ID: {s_id}, Page: {page}] | Content: {content}")
+    formatted = [format_block(doc) for doc in docs]
     return ("\n\n".join(formatted)).replace("{", "{{").replace("}", "}}")
 
+def pack_context(docs: list[Document]) -> tuple[list[Document], int]:
+    return pack_documents(docs, settings.CONTEXT_TOKEN_BUDGET, settings.OPENAI_MODEL_NAME)
+
 def prepare_chat_history(db_messages: list) -> list:
     chat_history = []
     for msg in db_messages:
         if msg.role == "human":
             chat_history.append(HumanMessage(content=msg.content))
+        elif msg.role == "summary":
+            chat_history.append(SystemMessage(content=f"Summary of the earlier conversation:\n{msg.content}"))
         else:
             chat_history.append(AIMessage(content=msg.content))
     return chat_history[::-1]
 
-async def find_context(
+retrieval_cache = create_cache("retrieval", settings.RETRIEVAL_CACHE_TTL_SECONDS, settings.RETRIEVAL_CACHE_MAX_ENTRIES)
+
+async def search_documents(
     notebook_id: int,
     request: QuestionRequest,
     vector_service: VectorService,
-):
+) -> list[Document]:
+    if request.mode in ("base", "mmr", "hybrid"):
+        return await vector_service.asearch(
+            notebook_id,
+            request.question,
+            mode=request.mode,
+            source_ids=request.source_ids,
+        )
+
+    # Multiquery needs the LLM-driven LangChain retriever
+    await vector_service.aresolve_owner(notebook_id)
     retriever = vector_service.get_retriever(
         notebook_id=notebook_id,
         mode=request.mode,
         source_ids=request.source_ids,
     )
 
-    docs = await retriever.ainvoke(request.question)
+    return await retriever.ainvoke(request.question)
+
+async def retrieve_documents(
+    notebook_id: int,
+    request: QuestionRequest,
+    vector_service: VectorService,
+    sources_version: Optional[int] = None,
+) -> list[Document]:
+    if sources_version is None or request.bypass_cache:
+        return await search_documents(notebook_id, request, vector_service)
+
+    # Any change to the indexed sources bumps sources_version, which retires older entries
+    cache_key = ":".join([
+        str(notebook_id),
+        str(sources_version),
+        request.mode,
+        ",".join(map(str, sorted(request.source_ids or []))),
+        hashlib.sha256(request.question.encode("utf-8")).hexdigest(),
+    ])
+
+    async def search() -> list[dict]:
+        docs = await search_documents(notebook_id, request, vector_service)
+        return [{"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata} for doc in docs]
+
+    return [Document(**doc) for doc in await retrieval_cache.get_or_set(cache_key, search)]
+
+async def _timed_retrieval(
+    notebook_id: int,
+    sources_version: int,
+    request: QuestionRequest,
+    vector_service: VectorService,
+) -> tuple[list[Document], float]:
+    started = time.perf_counter()
+    docs = await retrieve_documents(notebook_id, request, vector_service, sources_version)
+    return docs, round((time.perf_counter() - started) * 1000, 1)
+
+async def prepare_question(
+    notebook_id: int,
+    sources_version: int,
+    request: QuestionRequest,
+    chat_history: list,
+    vector_service: VectorService,
+    timer: StageTimer,
+) -> tuple[str, Optional[asyncio.Task]]:
+    if is_standalone_question(request.question, chat_history):
+        timer.strategy = "no_rephrase"
+        return request.question, None
+
+    # Retrieve for the raw question while the rephrase round trip is in flight
+    speculative = None
+    if settings.SPECULATIVE_RETRIEVAL:
+        speculative = asyncio.create_task(_timed_retrieval(notebook_id, sources_version, request, vector_service))
+
+    try:
+        with timer.stage("rephrase"):
+            standalone_question = await rephrase_user_query(
+                query=request.question,
+                chat_history=chat_history,
+                llm=vector_service.llm,
+            )
+    except BaseException:
+        if speculative:
+            speculative.cancel()
+        raise
 
-    return format_docs(docs)
+    return standalone_question, speculative
+
+async def resolve_documents(
+    notebook_id: int,
+    sources_version: int,
+    request: QuestionRequest,
+    standalone_question: str,
+    speculative: Optional[asyncio.Task],
+    vector_service: VectorService,
+    timer: StageTimer,
+) -> list[Document]:
+    if speculative is not None:
+        if query_overlap(request.question, standalone_question) >= settings.SPECULATIVE_REUSE_THRESHOLD:
+            with timer.stage("retrieval_wait"):
+                docs, elapsed = await speculative
+            timer.timings["retrieval_ms"] = elapsed
+            timer.timings["speculative_saved_ms"] = min(elapsed, timer.timings.get("rephrase_ms", 0.0))
+            timer.strategy = "speculative_kept"
+            return docs
+
+        speculative.cancel()
+        timer.strategy = "speculative_discarded"
+    elif timer.strategy is None:
+        timer.strategy = "sequential"
+
+    retrieval_request = request.model_copy(update={"question": standalone_question})
+    with timer.stage("retrieval"):
+        return await retrieve_documents(notebook_id, retrieval_request, vector_service, sources_version)
+
+async def lookup_cached_answer(
+    notebook_id: int,
+    sources_version: int,
+    standalone_question: str,
+    request: QuestionRequest,
+    vector_service: VectorService,
+):
+    # The question embedding lands in the embedding cache, so retrieval reuses it for free
+    vector = await vector_service.embeddings.aembed_query(standalone_question)
+    cache_key = (
+        notebook_id,
+        sources_version,
+        (request.mode, tuple(sorted(request.source_ids or []))),
+        normalize_question(standalone_question),
+        vector,
+    )
+
+    hit = vector_service.answer_cache.lookup(*cache_key)
+    if hit is None:
+        return None, cache_key
+
+    cached, similarity = hit
+    response = cached.model_copy(deep=True)
+    response.metadata = AnswerMetadata(cache_hit=True, cache_similarity=similarity)
+    return response, cache_key
+
+def store_cached_answer(cache_key: tuple, response: AskQuestionResponse, vector_service: VectorService):
+    vector_service.answer_cache.store(*cache_key, response)
 
 async def rephrase_user_query(
     query: str, 
@@ -61,6 +246,19 @@ async def rephrase_user_query(
     standalone_query = rephrased.content
     return standalone_query
 
+async def summarize_conversation(
+    summary: str,
+    messages: list,
+    llm: ChatOpenAI,
+) -> str:
+    # Messages come oldest first
+    transcript = "\n".join(
+        f"{'User' if msg.role == 'human' else 'Assistant'}: {msg.content}" for msg in messages
+    )
+    summary_chain = summary_prompt | llm
+    result = await summary_chain.ainvoke({"summary": summary or "(empty)", "messages": transcript})
+    return result.content.strip()
+
 async def get_llm_answer(
     query: str, 
     context: str, 
@@ -77,3 +275,22 @@ async def get_llm_answer(
             "chat_history": prepare_chat_history(chat_history) if chat_history else []
         }
     )
+
+async def stream_llm_answer(
+    query: str, 
+    context: str, 
+    chat_history: list,
+    llm: ChatOpenAI,
+):
+    # Tool calling streams its arguments, so partial answers can be parsed as they arrive
+    structured_llm = llm.with_structured_output(AskQuestionResponse, method="function_calling")
+    chain = qa_prompt | structured_llm
+
+    async for partial in chain.astream(
+        {
+            "question": query, 
+            "context": context, 
+            "chat_history": prepare_chat_history(chat_history) if chat_history else []
+        }
+    ):
+        yield partial
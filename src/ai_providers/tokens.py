@@ -0,0 +1,38 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache()
+def get_encoding(model: str = "") -> Optional[tiktoken.Encoding]:
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        # Encoding files are downloaded on first use; fall back to an estimate when offline
+        logger.warning("Could not load tiktoken encoding, token counts are estimated")
+        return None
+
+
+def count_tokens(text: str, model: str = "") -> int:
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "") -> str:
+    if max_tokens <= 0:
+        return ""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
@@ -1,34 +1,222 @@
+import asyncio
+import threading
+from collections import OrderedDict
+
+from src.cache import create_cache
 from src.config import settings
+from src.database import SessionLocal
+from src.notebooks.models import Notebook
+from .answer_cache import AnswerCache
+from .async_vector_store import BoundedAsyncCollection, ThreadedAsyncCollection, query_result_documents
+from .collection_layout import CollectionLayout
+from .embedding_batcher import BatchingEmbeddings
+from .embedding_cache import CachedEmbeddings
+from .flat_index import FlatIndexClient, FlatVectorStore
+from .hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+from .lexical_index import LexicalIndexStore
+from .rate_limit import RateLimitedEmbeddings, RateLimiter
+from .tokens import count_tokens
 
 import chromadb
+import httpx
 from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+import numpy as np
+from sqlalchemy import select
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_classic.retrievers import ContextualCompressionRetriever
 from langchain_classic.retrievers.multi_query import MultiQueryRetriever
 from langchain_classic.retrievers.document_compressors import LLMChainExtractor
 
 
+def create_vector_client():
+    # "http" talks to a Chroma server, "persistent" runs Chroma embedded in the app process,
+    # "flat" is an exact NumPy index over memory-mapped files with no Chroma at all.
+    if settings.VECTOR_BACKEND == "http":
+        return chromadb.HttpClient(
+            host=settings.CHROMADB_HOST, 
+            port=settings.CHROMADB_PORT,
+            settings=chromadb.Settings(
+                chroma_http_max_connections=settings.VECTOR_HTTP_MAX_CONNECTIONS,
+                chroma_http_max_keepalive_connections=settings.VECTOR_HTTP_MAX_CONNECTIONS,
+                chroma_http_keepalive_secs=settings.VECTOR_HTTP_KEEPALIVE_SECONDS,
+            ),
+        )
+    if settings.VECTOR_BACKEND == "persistent":
+        return chromadb.PersistentClient(path=settings.VECTOR_STORE_PATH)
+    if settings.VECTOR_BACKEND == "flat":
+        return FlatIndexClient(settings.VECTOR_STORE_PATH)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {settings.VECTOR_BACKEND}")
+
+
 class VectorService:
     def __init__(self):
-        self.client = chromadb.HttpClient(
-            host=settings.CHROMADB_HOST, 
-            port=settings.CHROMADB_PORT
+        self.client = create_vector_client()
+        self.layout = CollectionLayout(settings.VECTOR_COLLECTION_LAYOUT, settings.VECTOR_COLLECTION_SHARDS)
+        self._notebook_owners: OrderedDict[int, int] = OrderedDict()
+        # Handles are keyed by collection name, so notebooks sharing a collection share one
+        self._collections: OrderedDict[str, object] = OrderedDict()
+        self._collections_lock = threading.Lock()
+        self._async_client = None
+        self._async_limiter = asyncio.Semaphore(settings.VECTOR_ASYNC_MAX_IN_FLIGHT)
+        self._async_collections: OrderedDict[str, object] = OrderedDict()
+
+        # One connection pool for every OpenAI call the service makes, embeddings and chat alike
+        openai_limits = httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
         )
-        self.embeddings = OpenAIEmbeddings(api_key=settings.OPENAI_API_KEY)
-        self.llm = ChatOpenAI(model=settings.OPENAI_MODEL_NAME, temperature=0.5)
+        self.http_client = httpx.Client(limits=openai_limits, timeout=None)
+        self.http_async_client = httpx.AsyncClient(limits=openai_limits, timeout=None)
+
+        openai_embeddings = OpenAIEmbeddings(
+            api_key=settings.OPENAI_API_KEY,
+            chunk_size=settings.EMBEDDING_BATCH_SIZE,
+            # Retries happen in RateLimitedEmbeddings, where they are rate limited too
+            max_retries=0,
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+        )
+        self.embedding_limiter = RateLimiter(
+            requests_per_minute=settings.EMBEDDING_RPM_LIMIT,
+            tokens_per_minute=settings.EMBEDDING_TPM_LIMIT,
+        )
+        rate_limited_embeddings = RateLimitedEmbeddings(
+            openai_embeddings,
+            limiter=self.embedding_limiter,
+            model=openai_embeddings.model,
+            max_retries=settings.EMBEDDING_MAX_RETRIES,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+        )
+        # Files ingested side by side share embedding requests instead of each sending its own
+        batching_embeddings = BatchingEmbeddings(
+            rate_limited_embeddings,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            linger_seconds=settings.EMBEDDING_BATCH_LINGER_MS / 1000,
+        )
+        self.embeddings = CachedEmbeddings(
+            batching_embeddings,
+            model=openai_embeddings.model,
+            path=settings.EMBEDDING_CACHE_PATH,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+            query_cache=create_cache(
+                "query_embedding",
+                settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+                settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+            ),
+        )
+        self.llm = ChatOpenAI(
+            model=settings.OPENAI_MODEL_NAME,
+            temperature=0.5,
+            http_client=self.http_client,
+            http_async_client=self.http_async_client,
+        )
+        self.answer_cache = AnswerCache(
+            similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+            max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+            max_notebooks=settings.ANSWER_CACHE_MAX_NOTEBOOKS,
+        )
+        self.lexical_index = LexicalIndexStore(
+            settings.LEXICAL_INDEX_DIR,
+            max_notebooks=settings.LEXICAL_INDEX_MAX_NOTEBOOKS,
+            max_chunks=settings.LEXICAL_INDEX_MAX_CHUNKS,
+        )
+
+    def set_notebook_owner(self, notebook_id: int, owner_id: int):
+        # The per-user layout needs the owner; callers register it wherever they load the
+        # notebook, and the async paths look up whatever was not registered or got evicted
+        self._notebook_owners[notebook_id] = owner_id
+        self._notebook_owners.move_to_end(notebook_id)
+        while len(self._notebook_owners) > settings.VECTOR_OWNER_CACHE_SIZE:
+            self._notebook_owners.popitem(last=False)
+
+    async def aresolve_owner(self, notebook_id: int):
+        if not self.layout.needs_owner or notebook_id in self._notebook_owners:
+            return
+        async with SessionLocal() as db:
+            result = await db.execute(select(Notebook.user_id).where(Notebook.id == notebook_id))
+            owner_id = result.scalar_one_or_none()
+        if owner_id is None:
+            raise LookupError(f"Notebook {notebook_id} does not exist")
+        self.set_notebook_owner(notebook_id, owner_id)
+
+    def get_collection_name(self, notebook_id: int) -> str:
+        # Raises LookupError rather than guessing when the layout needs an unknown owner
+        return self.layout.collection_name(notebook_id, self._notebook_owners.get(notebook_id))
+
+    async def aget_collection_name(self, notebook_id: int) -> str:
+        await self.aresolve_owner(notebook_id)
+        return self.get_collection_name(notebook_id)
+
+    def _open_collection(self, name: str):
+        if isinstance(self.client, FlatIndexClient):
+            return FlatVectorStore(self.client.get_or_create_collection(name), self.embeddings)
 
-    def get_collection(self, notebook_id: int):
-        collection_name = f"notebook_{notebook_id}" 
-        
         return Chroma(
-            collection_name=collection_name,
+            collection_name=name,
             client=self.client,
             embedding_function=self.embeddings
         ) 
 
-    def get_retriever(self, notebook_id: int, mode: str = "base", source_ids: list[int] = None):
-        db = self.get_collection(notebook_id)
+    def get_collection(self, notebook_id: int):
+        return self._get_store(self.get_collection_name(notebook_id))
+
+    def _get_store(self, name: str):
+        # Opening a collection is a get-or-create round trip, so handles are kept in a bounded LRU
+        with self._collections_lock:
+            store = self._collections.get(name)
+            if store is not None:
+                self._collections.move_to_end(name)
+                return store
+
+        store = self._open_collection(name)
+        with self._collections_lock:
+            store = self._collections.setdefault(name, store)
+            self._collections.move_to_end(name)
+            while len(self._collections) > settings.VECTOR_COLLECTION_CACHE_SIZE:
+                self._collections.popitem(last=False)
+        return store
+
+    def get_raw_collection(self, notebook_id: int):
+        # LangChain's Chroma wrapper and the raw collection share one handle
+        return self.get_collection(notebook_id)._collection
+
+    def warm_up(self, notebook_owners: dict[int, int] = None):
+        # Opens the vector store connection, loads the tokenizer and pre-opens the handles of
+        # recently used notebooks so the first requests after a start don't pay for it.
+        self.client.heartbeat()
+        count_tokens("warm up", self.embeddings.model)
+        for notebook_id, owner_id in (notebook_owners or {}).items():
+            self.set_notebook_owner(notebook_id, owner_id)
+            self.get_collection(notebook_id)
+
+    async def aclose(self):
+        self.http_client.close()
+        await self.http_async_client.aclose()
 
+    def ensure_lexical_index(self, notebook_id: int):
+        # Notebooks indexed before hybrid search existed get their BM25 index built from Chroma
+        if self.lexical_index.exists(notebook_id):
+            return
+
+        collection = self.get_raw_collection(notebook_id)
+        batch_size = settings.INGESTION_BATCH_SIZE * 16
+        offset = 0
+        while True:
+            records = collection.get(
+                where={"notebook_id": notebook_id},
+                include=["documents", "metadatas"],
+                limit=batch_size,
+                offset=offset,
+            )
+            if not records["ids"]:
+                break
+            self.lexical_index.add(notebook_id, records["ids"], records["documents"], records["metadatas"])
+            offset += batch_size
+
+    def build_search_filter(self, notebook_id: int, source_ids: list[int] = None) -> dict:
         search_filter = {"notebook_id": notebook_id}
         if source_ids:
             search_filter = {
@@ -37,14 +225,162 @@ class VectorService:
                     {"source_id": {"$in": source_ids}}
                 ]
             }
+        return search_filter
+
+    def get_retriever(self, notebook_id: int, mode: str = "base", source_ids: list[int] = None):
+        db = self.get_collection(notebook_id)
+
+        search_filter = self.build_search_filter(notebook_id, source_ids)
 
         if mode == "mmr":
             return db.as_retriever(search_type="mmr", search_kwargs={"k": 5, "filter": search_filter})
 
+        if mode == "hybrid":
+            return HybridRetriever(
+                vector_retriever=db.as_retriever(search_kwargs={"k": 20, "filter": search_filter}),
+                vector_service=self,
+                notebook_id=notebook_id,
+                source_ids=source_ids,
+            )
+
         if mode == "multiquery" and self.llm:
             return MultiQueryRetriever.from_llm(
                 retriever=db.as_retriever(search_kwargs={"filter": search_filter}), 
                 llm=self.llm
             )
 
-        return db.as_retriever(search_kwargs={"k": 5, "filter": search_filter})
\ No newline at end of file
+        return db.as_retriever(search_kwargs={"k": 5, "filter": search_filter})
+
+    # Async-native access, used on the request and ingestion paths instead of thread hops
+
+    async def aget_raw_collection(self, notebook_id: int):
+        name = await self.aget_collection_name(notebook_id)
+        collection = self._async_collections.get(name)
+        if collection is not None:
+            self._async_collections.move_to_end(name)
+            return collection
+
+        if settings.VECTOR_BACKEND == "http":
+            if self._async_client is None:
+                client = await chromadb.AsyncHttpClient(
+                    host=settings.CHROMADB_HOST,
+                    port=settings.CHROMADB_PORT,
+                    settings=chromadb.Settings(
+                        chroma_http_max_connections=settings.VECTOR_HTTP_MAX_CONNECTIONS,
+                        chroma_http_max_keepalive_connections=settings.VECTOR_HTTP_MAX_CONNECTIONS,
+                        chroma_http_keepalive_secs=settings.VECTOR_HTTP_KEEPALIVE_SECONDS,
+                    ),
+                )
+                self._async_client = self._async_client or client
+            async with self._async_limiter:
+                collection = await self._async_client.get_or_create_collection(
+                    name=name,
+                    embedding_function=None,
+                )
+            collection = BoundedAsyncCollection(collection, self._async_limiter)
+        else:
+            store = await asyncio.to_thread(self._get_store, name)
+            collection = ThreadedAsyncCollection(store._collection)
+
+        collection = self._async_collections.setdefault(name, collection)
+        while len(self._async_collections) > settings.VECTOR_COLLECTION_CACHE_SIZE:
+            self._async_collections.popitem(last=False)
+        return collection
+
+    async def aensure_lexical_index(self, notebook_id: int):
+        if not self.lexical_index.exists(notebook_id):
+            await self.aresolve_owner(notebook_id)
+            await asyncio.to_thread(self.ensure_lexical_index, notebook_id)
+
+    async def aget_source_records(
+        self,
+        notebook_id: int,
+        source_id: int,
+        include: list[str] = None,
+        limit: int = None,
+        offset: int = None,
+    ) -> dict:
+        collection = await self.aget_raw_collection(notebook_id)
+        return await collection.get(
+            where={"$and": [{"notebook_id": notebook_id}, {"source_id": source_id}]},
+            include=include if include is not None else ["embeddings", "documents", "metadatas"],
+            limit=limit,
+            offset=offset,
+        )
+
+    async def aget_records(self, notebook_id: int, ids: list[str], include: list[str] = None) -> dict:
+        collection = await self.aget_raw_collection(notebook_id)
+        return await collection.get(
+            ids=ids,
+            where={"notebook_id": notebook_id},
+            include=include if include is not None else ["embeddings", "documents", "metadatas"],
+        )
+
+    async def aupsert_records(
+        self,
+        notebook_id: int,
+        ids: list[str],
+        embeddings: list,
+        documents: list[str],
+        metadatas: list[dict],
+    ):
+        await self.aensure_lexical_index(notebook_id)
+        collection = await self.aget_raw_collection(notebook_id)
+        await collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        await asyncio.to_thread(self.lexical_index.add, notebook_id, ids, documents, metadatas)
+
+    async def adelete_records(self, notebook_id: int, ids: list[str] = None, where: dict = None):
+        collection = await self.aget_raw_collection(notebook_id)
+        if ids is None:
+            # Collections can be shared between notebooks, so deletes stay inside this one
+            scope = {"notebook_id": notebook_id}
+            where = {"$and": [scope, where]} if where else scope
+            ids = (await collection.get(where=where, include=[]))["ids"]
+        if ids:
+            await collection.delete(ids=ids)
+            await asyncio.to_thread(self.lexical_index.remove, notebook_id, ids)
+
+    async def asearch(
+        self,
+        notebook_id: int,
+        query: str,
+        mode: str = "base",
+        source_ids: list[int] = None,
+        k: int = 5,
+        fetch_k: int = 20,
+    ) -> list[Document]:
+        # Same results as the base, mmr and hybrid retrievers without LangChain's sync shims
+        search_filter = self.build_search_filter(notebook_id, source_ids)
+        embedding = await self.embeddings.aembed_query(query)
+        collection = await self.aget_raw_collection(notebook_id)
+
+        if mode == "mmr":
+            results = await collection.query(
+                query_embeddings=[embedding],
+                n_results=fetch_k,
+                where=search_filter,
+                include=["embeddings", "documents", "metadatas"],
+            )
+            candidates = query_result_documents(results)
+            if not candidates:
+                return []
+            selected = maximal_marginal_relevance(
+                np.array(embedding, dtype=np.float32), results["embeddings"][0], k=k, lambda_mult=0.5
+            )
+            return [candidates[index] for index in selected]
+
+        results = await collection.query(
+            query_embeddings=[embedding],
+            n_results=fetch_k if mode == "hybrid" else k,
+            where=search_filter,
+            include=["documents", "metadatas"],
+        )
+        dense = query_result_documents(results)
+        if mode != "hybrid":
+            return dense
+
+        await self.aensure_lexical_index(notebook_id)
+        lexical = await asyncio.to_thread(
+            self.lexical_index.search, notebook_id, query, k=fetch_k, source_ids=source_ids
+        )
+        return reciprocal_rank_fusion([dense, lexical], k=k)
@@ -7,6 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
 from src.config import settings
 from src.users.models import User
+from .user_cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -24,9 +25,14 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     except JWTError:
         raise credentials_exception
 
+    user = await user_cache.get(email)
+    if user is not None:
+        return user
+
     query = select(User).where(User.email == email)
     result = await db.execute(query)
     user = result.scalar_one_or_none()
     if user is None:
         raise credentials_exception
+    await user_cache.set(email, user)
     return user
\ No newline at end of file
@@ -1,6 +1,9 @@
 from src.auth.oauth import oauth
+from src.auth.dependencies import get_current_user
 from src.auth.security import create_access_token
+from src.auth.user_cache import user_cache
 from src.database import get_db
+from src.users.models import User
 from src.users.schemas import Token, UserCreate, UserRead
 from .service import authenticate_user, create_new_user, get_or_create_google_user
 
@@ -20,6 +23,10 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Async
     auth_result = await authenticate_user(db, form_data.username, form_data.password)
     return auth_result
 
+@router.get("/cache/stats")
+async def get_user_cache_stats(current_user: User = Depends(get_current_user)):
+    return user_cache.stats()
+
 @router.get("/google/login")
 async def google_login(request: Request):
     redirect_uri = request.url_for("google_auth")
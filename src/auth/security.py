@@ -1,12 +1,18 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from fastapi import HTTPException, status
 from jose import jwt
 from src.config import settings
 import bcrypt
 
+_password_executor: Optional[ThreadPoolExecutor] = None
+_password_jobs = 0
+
 def hash_password(password: str) -> str:
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
     hashed_password = bcrypt.hashpw(pwd_bytes, salt)
     return hashed_password.decode('utf-8')
 
@@ -15,6 +21,46 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     hashed_bytes = hashed_password.encode('utf-8')
     return bcrypt.checkpw(password_bytes, hashed_bytes)
 
+def needs_rehash(hashed_password: str) -> bool:
+    # bcrypt hashes look like $2b$<cost>$<salt and digest>
+    try:
+        rounds = int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != settings.BCRYPT_ROUNDS
+
+def password_worker_idle() -> bool:
+    return _password_jobs < settings.PASSWORD_HASH_WORKERS
+
+async def _run_password_job(func, *args):
+    # bcrypt holds a CPU for hundreds of milliseconds, so it runs on its own small pool.
+    # Requests beyond the pool plus PASSWORD_HASH_QUEUE_LIMIT waiting ones are turned away
+    # immediately instead of piling up behind a login burst.
+    global _password_executor, _password_jobs
+    if _password_jobs >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_QUEUE_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again shortly.",
+            headers={"Retry-After": "1"},
+        )
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password",
+        )
+
+    _password_jobs += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_jobs -= 1
+
+async def ahash_password(password: str) -> str:
+    return await _run_password_job(hash_password, password)
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -1,11 +1,16 @@
+import logging
+
 from src.users import models
 from src.users.schemas import Token, UserCreate
-from .security import create_access_token, hash_password, verify_password
+from .security import ahash_password, averify_password, create_access_token, needs_rehash, password_worker_idle
 
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+
+logger = logging.getLogger(__name__)
+
 async def get_user_by_email(db: AsyncSession, email: str) -> models.User | None:
     query = select(models.User).where(models.User.email == email)
     result = await db.execute(query)
@@ -24,7 +29,7 @@ async def create_new_user(db: AsyncSession, user_data: UserCreate) -> models.Use
     
     new_user = models.User(
         email=user_data.email,
-        hashed_password=hash_password(user_data.password)
+        hashed_password=await ahash_password(user_data.password)
     )
 
     db.add(new_user)
@@ -35,11 +40,20 @@ async def create_new_user(db: AsyncSession, user_data: UserCreate) -> models.Use
 async def authenticate_user(db: AsyncSession, email: str, password: str) -> Token | None:
     user = await get_user_by_email(db, email)
     
-    if not user or not verify_password(password, user.hashed_password):
+    if not user or not user.hashed_password or not await averify_password(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Invalid email or password"
         )
+
+    # Moves stored hashes to the current BCRYPT_ROUNDS as users log in. It is optional, so it
+    # only runs while a hashing worker is free and never fails a login the password passed.
+    if needs_rehash(user.hashed_password) and password_worker_idle():
+        try:
+            user.hashed_password = await ahash_password(password)
+            await db.commit()
+        except HTTPException:
+            logger.info("Skipped rehashing the password of user %s, hashing workers are busy", user.id)
     
     token = create_access_token(data={"sub": str(user.email)})
     return Token(access_token=token)
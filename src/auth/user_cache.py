@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from src.cache import Cache, create_cache
+from src.config import settings
+from src.users.models import User
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+
+# Columns kept for an authenticated principal; the password hash never leaves the database
+CACHED_COLUMNS = ("id", "email", "full_name", "is_active", "created_at", "updated_at")
+
+
+# Authenticated users keyed by the token subject (the email). Entries expire after the TTL
+# and are dropped as soon as the user row is updated or deleted through the ORM.
+class UserCache:
+    def __init__(self, cache: Cache):
+        self.cache = cache
+
+    @staticmethod
+    def _dump(user: User) -> dict:
+        values = {}
+        for column in CACHED_COLUMNS:
+            value = getattr(user, column)
+            values[column] = value.isoformat() if isinstance(value, datetime) else value
+        return values
+
+    @staticmethod
+    def _load(values: dict) -> User:
+        for column in ("created_at", "updated_at"):
+            if values[column] is not None:
+                values[column] = datetime.fromisoformat(values[column])
+        return User(**values)
+
+    async def get(self, subject: str) -> Optional[User]:
+        values = await self.cache.get(subject)
+        return self._load(values) if values is not None else None
+
+    async def set(self, subject: str, user: User):
+        await self.cache.set(subject, self._dump(user))
+
+    async def invalidate(self, subject: str):
+        await self.cache.delete(subject)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+user_cache = UserCache(
+    create_cache("auth_user", settings.USER_CACHE_TTL_SECONDS, settings.USER_CACHE_MAX_ENTRIES)
+)
+
+
+_pending_invalidations: set[asyncio.Task] = set()
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _collect_changed_user(mapper, connection, target: User):
+    # Bulk UPDATE statements bypass this hook; such changes are only bounded by the TTL
+    subjects = object_session(target).info.setdefault("changed_user_subjects", set())
+    subjects.add(target.email)
+    subjects.update(email for email in inspect(target).attrs.email.history.deleted if email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session):
+    session.info.pop("changed_user_subjects", None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session):
+    # Dropped only after commit, so a concurrent request can't cache the old row again
+    for subject in session.info.pop("changed_user_subjects", ()):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(user_cache.invalidate(subject))
+            continue
+        task = loop.create_task(user_cache.invalidate(subject))
+        _pending_invalidations.add(task)
+        task.add_done_callback(_pending_invalidations.discard)
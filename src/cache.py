@@ -0,0 +1,220 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from src.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheBackend:
+    # Per-process LRU bounded by entry count and by the total size of the stored values
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._bytes = 0
+
+    def _pop(self, key: str):
+        _, value = self._entries.pop(key)
+        self._bytes -= len(value)
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._pop(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: str, ttl_seconds: int):
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (time.monotonic() + ttl_seconds, value)
+            self._bytes += len(value)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._pop(next(iter(self._entries)))
+
+    async def add(self, key: str, value: str, ttl_seconds: int) -> bool:
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl_seconds)
+        return True
+
+    async def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+
+
+class RedisCacheBackend:
+    # Shared by every namespace and worker; overall memory is bounded by Redis' own maxmemory policy
+    def __init__(self, host: str, port: int):
+        # redis is an optional dependency, only needed when REDIS_HOST is set
+        from redis import asyncio as redis
+
+        self._client = redis.Redis(host=host, port=port, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str, ttl_seconds: int):
+        await self._client.set(key, value, ex=ttl_seconds)
+
+    async def add(self, key: str, value: str, ttl_seconds: int) -> bool:
+        return bool(await self._client.set(key, value, ex=ttl_seconds, nx=True))
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+
+# JSON values under "<CACHE_KEY_PREFIX>:<namespace>:<key>" with a per-namespace TTL. Backend
+# failures are logged and count as misses, so a Redis outage only costs recomputation.
+class Cache:
+    def __init__(self, backend, namespace: str, ttl_seconds: int):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def _key(self, key: str) -> str:
+        return f"{settings.CACHE_KEY_PREFIX}:{self.namespace}:{key}"
+
+    async def _read(self, key: str) -> Optional[Any]:
+        try:
+            value = await self.backend.get(self._key(key))
+        except Exception:
+            logger.warning("Cache lookup in %s failed", self.namespace, exc_info=True)
+            return None
+        return json.loads(value) if value is not None else None
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self._read(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+        payload = json.dumps(value, separators=(",", ":"))
+        if len(payload) > settings.CACHE_MAX_VALUE_KB * 1024:
+            return
+        try:
+            await self.backend.set(self._key(key), payload, ttl_seconds or self.ttl_seconds)
+        except Exception:
+            logger.warning("Cache store in %s failed", self.namespace, exc_info=True)
+
+    async def delete(self, key: str):
+        try:
+            await self.backend.delete(self._key(key))
+        except Exception:
+            logger.warning("Cache delete in %s failed", self.namespace, exc_info=True)
+
+    async def get_or_set(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        # Stampede protection: concurrent misses in this process share one loader call
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The loading request went away; unless this one did too, it takes over
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return await self.get_or_set(key, loader)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, loader)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters see the error; mark it retrieved so an unwaited future doesn't log it
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        # Across workers, the first miss takes a short lock while the others wait for
+        # its value. Should the holder not deliver within the lock timeout, they load it themselves.
+        lock_key = f"{key}:lock"
+        try:
+            locked = await self.backend.add(self._key(lock_key), "1", settings.CACHE_LOCK_TIMEOUT_SECONDS)
+        except Exception:
+            logger.warning("Cache lock in %s failed", self.namespace, exc_info=True)
+            locked = True
+
+        if not locked:
+            deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT_SECONDS
+            while time.monotonic() < deadline:
+                await asyncio.sleep(settings.CACHE_LOCK_POLL_MS / 1000)
+                value = await self._read(key)
+                if value is not None:
+                    return value
+                # The holder gave up without a value, e.g. its loader failed
+                if not await self._locked(lock_key):
+                    break
+
+        try:
+            value = await loader()
+            await self.set(key, value)
+            return value
+        finally:
+            if locked:
+                await self.delete(lock_key)
+
+    async def _locked(self, lock_key: str) -> bool:
+        try:
+            return await self.backend.get(self._key(lock_key)) is not None
+        except Exception:
+            return False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_redis_backend: Optional[RedisCacheBackend] = None
+
+
+def create_cache(namespace: str, ttl_seconds: int, max_entries: int) -> Cache:
+    # Redis when REDIS_HOST is set, so every worker shares one warm cache; otherwise an
+    # in-process LRU per namespace, which needs no services at all
+    global _redis_backend
+    if settings.REDIS_HOST:
+        if _redis_backend is None:
+            _redis_backend = RedisCacheBackend(settings.REDIS_HOST, settings.REDIS_PORT)
+        backend = _redis_backend
+    else:
+        backend = MemoryCacheBackend(max_entries, settings.CACHE_MEMORY_MAX_MB * 1024 * 1024)
+    return Cache(backend, namespace, ttl_seconds)
@@ -38,14 +38,99 @@ class Settings(BaseSettings):
     REDIS_HOST: Optional[str] = None
     REDIS_PORT: int = 6379
 
+    # Shared cache (Redis when REDIS_HOST is set, in-process LRU otherwise)
+    CACHE_KEY_PREFIX: str = "synapse"
+    CACHE_MAX_VALUE_KB: int = 512
+    CACHE_MEMORY_MAX_MB: int = 64  # per namespace, in-process backend only
+    CACHE_LOCK_TIMEOUT_SECONDS: int = 10
+    CACHE_LOCK_POLL_MS: int = 50
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: int = 86400
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = 10_000
+    RETRIEVAL_CACHE_TTL_SECONDS: int = 600
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = 2000
+    LISTING_CACHE_TTL_SECONDS: int = 300
+    LISTING_CACHE_MAX_ENTRIES: int = 5000
+
+    # Auth
+    USER_CACHE_TTL_SECONDS: int = 300
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32
+
     # External APIs
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL_NAME: str = ""
     OPENAI_EMBEDDING_MODEL: str = ""
+    OPENAI_MAX_CONNECTIONS: int = 64
+
+    # Embeddings
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_BATCH_SIZE: int = 1000
+    EMBEDDING_RPM_LIMIT: int = 3000
+    EMBEDDING_TPM_LIMIT: int = 1_000_000
+    EMBEDDING_MAX_RETRIES: int = 5
+    EMBEDDING_BATCH_LINGER_MS: int = 50
+
+    # Embedding cache
+    EMBEDDING_CACHE_PATH: str = "/app/storage/cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_MB: int = 512
+
+    # Answer cache
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    ANSWER_CACHE_MAX_ENTRIES: int = 256
+    ANSWER_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    ANSWER_CACHE_MAX_NOTEBOOKS: int = 256
+
+    # Retrieval
+    SPECULATIVE_RETRIEVAL: bool = True
+    SPECULATIVE_REUSE_THRESHOLD: float = 0.5
+    LEXICAL_INDEX_DIR: str = "/app/storage/lexical"
+    LEXICAL_INDEX_MAX_NOTEBOOKS: int = 64
+    LEXICAL_INDEX_MAX_CHUNKS: int = 200_000
+    CONTEXT_TOKEN_BUDGET: int = 3000
+
+    # Conversation memory
+    HISTORY_RECENT_TURNS: int = 3
+    HISTORY_TOKEN_BUDGET: int = 1500
+    HISTORY_SUMMARY_BATCH: int = 4
+    CHAT_WRITE_BEHIND: bool = False
+    CHAT_WRITE_DURABLE_ACK: bool = True
+    CHAT_WRITE_MAX_BATCH: int = 256
 
     # ChromaDB
     CHROMADB_HOST: str = "" 
     CHROMADB_PORT: int = 8000
+    VECTOR_BACKEND: str = "http"
+    VECTOR_STORE_PATH: str = "/app/storage/vectors"
+    VECTOR_HTTP_MAX_CONNECTIONS: int = 64
+    VECTOR_HTTP_KEEPALIVE_SECONDS: int = 30
+    VECTOR_ASYNC_MAX_IN_FLIGHT: int = 16
+    VECTOR_COLLECTION_CACHE_SIZE: int = 256
+    VECTOR_COLLECTION_LAYOUT: str = "notebook"
+    VECTOR_COLLECTION_SHARDS: int = 16
+    VECTOR_OWNER_CACHE_SIZE: int = 10_000
+    VECTOR_WARM_UP_NOTEBOOKS: int = 20
+
+    # Pagination
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 200
+
+    # Uploads
+    MAX_UPLOAD_SIZE_MB: int = 200
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    BATCH_UPLOAD_MAX_FILES: int = 100
+
+    # Ingestion
+    INGESTION_WORKERS: int = 2
+    INGESTION_BATCH_SIZE: int = 64
+    INGESTION_MAX_INFLIGHT_BATCHES: int = 4
+    # A running job renews its lease every heartbeat; jobs whose lease ran out are requeued
+    INGESTION_JOB_HEARTBEAT_SECONDS: int = 30
+    INGESTION_JOB_LEASE_SECONDS: int = 120
+    PDF_PARSE_WORKERS: int = 0  # 0 means one worker per CPU core
+    PDF_PAGES_PER_TASK: int = 8
+    PDF_PARSE_WINDOW: int = 2
 
     # LangChain
     SEARCH_MODE: str = "base" 
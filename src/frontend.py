@@ -4,9 +4,11 @@ from typing import List, Dict, Any
 from pathlib import Path
 import json
 import os
+import time
 
 BASE_URL = "http://fastapi:8000"  # Correct URL inside Docker network
 # BASE_URL = "http://localhost:8001"  # Only for local testing
+JOB_WAIT_TIMEOUT_SECONDS = 600
 
 st.set_page_config(page_title="SynapseAI", layout="wide")
 
@@ -20,6 +22,10 @@ if "current_notebook_id" not in st.session_state:
     st.session_state.current_notebook_id = st.session_state.get("notebook_id")
 if "last_loaded_id" not in st.session_state:
     st.session_state.last_loaded_id = None
+if "older_messages_cursor" not in st.session_state:
+    st.session_state.older_messages_cursor = None
+if "etag_cache" not in st.session_state:
+    st.session_state.etag_cache = {}
 if "notebooks" not in st.session_state:
     st.session_state.notebooks = []
 
@@ -75,37 +81,110 @@ def auth_headers() -> Dict[str, str]:
 
 
 # --- API client helpers ---
+def api_get_cached(path: str, params: Dict[str, Any] | None = None) -> tuple[int, Any]:
+    # Every rerun revalidates with If-None-Match; unchanged lists come back as an empty 304
+    key = (st.session_state.auth_token, path, tuple(sorted((params or {}).items())))
+    cached = st.session_state.etag_cache.get(key)
+    headers = auth_headers()
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    resp = httpx.get(f"{BASE_URL}{path}", headers=headers, params=params, timeout=15)
+    if resp.status_code == 304 and cached:
+        return 200, cached[1]
+    if resp.status_code != 200:
+        return resp.status_code, None
+    data = resp.json()
+    if resp.headers.get("etag"):
+        st.session_state.etag_cache[key] = (resp.headers["etag"], data)
+    return 200, data
+
+
 def api_get_notebooks() -> List[Dict[str, Any]]:
     try:
-        resp = httpx.get(f"{BASE_URL}/notebooks/", headers=auth_headers(), timeout=15)
-        if resp.status_code == 200:
-            return resp.json() or []
-        st.error(f"Notebooks error: {resp.status_code}")
+        status_code, notebooks = api_get_cached("/notebooks/")
+        if status_code == 200:
+            return notebooks or []
+        st.error(f"Notebooks error: {status_code}")
     except Exception as e:
         st.error(f"Connection error (list): {e}")
     return []
 
 
 def api_get_sources(notebook_id: int) -> List[Dict[str, Any]]:
+    # The source picker needs every source, so follow the cursor to the last page
+    sources, params = [], {}
     try:
-        resp = httpx.get(f"{BASE_URL}/notebooks/{notebook_id}/sources", headers=auth_headers(), timeout=15)
-        if resp.status_code == 200:
-            return resp.json() or []
+        while True:
+            status_code, page = api_get_cached(f"/notebooks/{notebook_id}/sources", params)
+            if status_code != 200:
+                break
+            page = page or {}
+            sources.extend(page.get("items", []))
+            if page.get("next_cursor") is None:
+                break
+            params = {"after_id": page["next_cursor"]}
     except Exception:
         pass
-    return []
+    return sources
+
+
+def api_delete_source(source_id: int) -> bool:
+    try:
+        resp = httpx.delete(f"{BASE_URL}/notebooks/source/{source_id}", headers=auth_headers(), timeout=15)
+    except Exception as e:
+        st.error(f"Connection error (delete): {e}")
+        return False
+    if resp.status_code not in (200, 202):
+        st.error(f"Delete failed: {resp.status_code} - {resp.text}")
+        return False
+    return True
+
+
+def api_get_chat_history(notebook_id: int, before_id: int | None = None) -> tuple[List[Dict[str, Any]], int | None]:
+    # Returns one page in chronological order and the cursor for the page of older messages
+    params = {"before_id": before_id} if before_id else {}
+    try:
+        status_code, page = api_get_cached(f"/notebooks/{notebook_id}/chat_history", params)
+        if status_code == 200:
+            # Backend returns newest first, we want chronological
+            page = page or {}
+            return page.get("items", [])[::-1], page.get("next_cursor")
+    except Exception:
+        pass
+    return [], None
 
 
-def api_get_chat_history(notebook_id: int) -> List[Dict[str, Any]]:
+def api_get_job(job_id: int) -> Dict[str, Any]:
     try:
-        resp = httpx.get(f"{BASE_URL}/notebooks/{notebook_id}/chat_history", headers=auth_headers(), timeout=15)
+        resp = httpx.get(f"{BASE_URL}/notebooks/jobs/{job_id}", headers=auth_headers(), timeout=15)
         if resp.status_code == 200:
-            # Backend usually returns newest first, we want chronological
-            history = resp.json() or []
-            return history[::-1]
+            return resp.json() or {}
     except Exception:
         pass
-    return []
+    return {}
+
+
+def wait_for_job(job_id: int, timeout: float = JOB_WAIT_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    progress = st.progress(0.0, text="Queued...")
+    deadline = time.monotonic() + timeout
+    while True:
+        job = api_get_job(job_id)
+        if not job or job.get("phase") in ("completed", "failed"):
+            progress.empty()
+            return job
+        if time.monotonic() >= deadline:
+            progress.empty()
+            # The job keeps running in the backend, only the waiting stops
+            return {**job, "phase": "timeout"}
+
+        phase = (job.get("phase") or "queued").capitalize()
+        done = job.get("chunks_done") or 0
+        total = job.get("chunks_total")
+        if total:
+            progress.progress(min(done / total, 1.0), text=f"{phase}: {done}/{total} chunks")
+        else:
+            progress.progress(0.0, text=f"{phase}...")
+        time.sleep(1)
 
 
 def api_create_notebook(title: str) -> Dict[str, Any]:
@@ -209,8 +288,10 @@ def load_notebooks():
 
 def upload_section(notebook_id: Any):
     st.subheader("📁 Upload Sources")
-    uploaded_file = st.file_uploader("Choose a PDF file", type="pdf")
-    if uploaded_file and st.button("Upload"):
+    uploaded_files = st.file_uploader(
+        "Choose PDF files or a ZIP archive of PDFs", type=["pdf", "zip"], accept_multiple_files=True
+    )
+    if uploaded_files and st.button("Upload"):
         if not st.session_state.auth_token:
             st.warning("Please log in first.")
             return
@@ -218,22 +299,121 @@ def upload_section(notebook_id: Any):
             st.warning("Please select a notebook.")
             return
 
-        files = {"file": (uploaded_file.name, uploaded_file.getvalue(), "application/pdf")}
-        try:
-            resp = httpx.post(
-                f"{BASE_URL}/notebooks/source/{notebook_id}/upload",
-                headers=auth_headers(),
-                files=files,
-                timeout=60,
-            )
-        except Exception as e:
-            st.error(f"Upload failed: {e}")
-            return
+        if len(uploaded_files) == 1 and uploaded_files[0].type == "application/pdf":
+            upload_single(notebook_id, uploaded_files[0])
+        else:
+            upload_batch(notebook_id, uploaded_files)
 
-        if resp.status_code == 200:
-            st.success("File indexed!")
+
+def upload_single(notebook_id: Any, uploaded_file: Any):
+    files = {"file": (uploaded_file.name, uploaded_file.getvalue(), "application/pdf")}
+    try:
+        resp = httpx.post(
+            f"{BASE_URL}/notebooks/source/{notebook_id}/upload",
+            headers=auth_headers(),
+            files=files,
+            timeout=60,
+        )
+    except Exception as e:
+        st.error(f"Upload failed: {e}")
+        return
+
+    if resp.status_code not in (200, 202):
+        st.error(f"Upload failed: {resp.status_code} - {resp.text}")
+        return
+
+    job = wait_for_job(resp.json().get("job_id"))
+    if job.get("phase") == "completed":
+        st.success("File indexed!")
+    elif job.get("phase") == "timeout":
+        st.warning("Still indexing, the file will show up once it is done.")
+    else:
+        st.error(f"Indexing failed: {job.get('error') or 'unknown error'}")
+
+
+def upload_batch(notebook_id: Any, uploaded_files: List[Any]):
+    files = [("files", (f.name, f.getvalue(), f.type or "application/octet-stream")) for f in uploaded_files]
+    try:
+        resp = httpx.post(
+            f"{BASE_URL}/notebooks/source/{notebook_id}/upload/batch",
+            headers=auth_headers(),
+            files=files,
+            timeout=300,
+        )
+    except Exception as e:
+        st.error(f"Upload failed: {e}")
+        return
+
+    if resp.status_code not in (200, 202):
+        st.error(f"Upload failed: {resp.status_code} - {resp.text}")
+        return
+
+    # The backend indexes the files side by side, so waiting on them in order costs nothing extra
+    for result in resp.json().get("files", []):
+        name = result.get("filename")
+        if result.get("status") != "queued":
+            st.error(f"{name}: {result.get('error') or 'upload failed'}")
+            continue
+        job = wait_for_job(result.get("job_id"))
+        if job.get("phase") == "completed":
+            st.success(f"{name}: indexed")
+        elif job.get("phase") == "timeout":
+            st.warning(f"{name}: still indexing, it will show up once it is done")
         else:
-            st.error(f"Upload failed: {resp.status_code} - {resp.text}")
+            st.error(f"{name}: indexing failed: {job.get('error') or 'unknown error'}")
+
+
+def iter_sse(resp: httpx.Response):
+    event, data = "message", []
+    for line in resp.iter_lines():
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def stream_answer(notebook_id: Any, payload: Dict[str, Any], status: Any, placeholder: Any) -> str | None:
+    stage_labels = {
+        "rephrasing": "Understanding the question...",
+        "retrieving": "Searching your documents...",
+        "generating": "Writing the answer...",
+    }
+    answer = ""
+    status.caption("Thinking...")
+    with httpx.stream(
+        "POST",
+        f"{BASE_URL}/notebooks/notebook/{notebook_id}/ask/stream",
+        headers=auth_headers(),
+        json=payload,
+        timeout=60,
+    ) as resp:
+        if resp.status_code != 200:
+            resp.read()
+            st.error(f"Ask failed: {resp.status_code} - {resp.text}")
+            return None
+
+        for event, data in iter_sse(resp):
+            if event == "stage":
+                status.caption(stage_labels.get(data.get("stage"), "Thinking..."))
+            elif event == "sources":
+                pages = ", ".join(f"#{d.get('source_id')} p.{d.get('page')}" for d in data)
+                status.caption(f"Found: {pages}" if pages else "No matching passages found.")
+            elif event == "token":
+                answer += data.get("text", "")
+                placeholder.markdown(answer + "▌")
+            elif event == "answer":
+                answer = data.get("answer", answer)
+                placeholder.markdown(answer)
+                status.empty()
+            elif event == "error":
+                status.empty()
+                st.error(f"Ask failed: {data.get('detail')}")
+                return None
+    return answer
 
 
 def chat_interface(notebook_id: Any):
@@ -252,6 +432,16 @@ def chat_interface(notebook_id: Any):
                 format_func=lambda x: source_options[x],
                 key=f"source_sel_{notebook_id}"
             )
+            with st.expander("Manage sources"):
+                source_to_delete = st.selectbox(
+                    "Source",
+                    options=list(source_options.keys()),
+                    format_func=lambda x: source_options[x],
+                    key=f"source_del_{notebook_id}"
+                )
+                if st.button("Delete source", key=f"source_del_btn_{notebook_id}"):
+                    if api_delete_source(source_to_delete):
+                        st.rerun()
         else:
             st.write("No sources indexed yet.")
 
@@ -266,6 +456,12 @@ def chat_interface(notebook_id: Any):
         prompt = st.chat_input("Ask something about your docs...")
 
         with chat_container:
+            cursor = st.session_state.older_messages_cursor
+            if cursor and st.button("Load older messages", key=f"older_{notebook_id}"):
+                older, st.session_state.older_messages_cursor = api_get_chat_history(notebook_id, before_id=cursor)
+                st.session_state.messages = older + st.session_state.messages
+                st.rerun()
+
             # Display history
             for msg in st.session_state.messages:
                 role = "user" if msg.get("role") in ("human", "user") else "assistant"
@@ -285,20 +481,14 @@ def chat_interface(notebook_id: Any):
                         "mode": "mmr",
                         "source_ids": selected_source_ids if selected_source_ids else None
                     }
-                    with st.spinner("Thinking..."):
+                    with st.chat_message("assistant"):
+                        status = st.empty()
+                        placeholder = st.empty()
                         try:
-                            resp = httpx.post(
-                                f"{BASE_URL}/notebooks/notebook/{notebook_id}/ask",
-                                headers=auth_headers(),
-                                json=payload,
-                                timeout=60,
-                            )
-                            if resp.status_code == 200:
-                                answer = resp.json().get("answer")
+                            answer = stream_answer(notebook_id, payload, status, placeholder)
+                            if answer is not None:
                                 st.session_state.messages.append({"role": "ai", "content": answer})
                                 safe_rerun()
-                            else:
-                                st.error(f"Ask failed: {resp.status_code} - {resp.text}")
                         except Exception as e:
                             st.error(f"Request failed: {e}")
 
@@ -331,11 +521,7 @@ def main():
                     nid = created.get("id")
                     if nid:
                         st.session_state.current_notebook_id = nid
-                        # Find the matching notebook object in the new list to update the selectbox
-                        for nb in st.session_state.notebooks:
-                            if nb.get("id") == nid:
-                                st.session_state._nb_select = nb
-                                break
+                        st.session_state._nb_select = nid
                     safe_rerun()
                 else:
                     st.error("Failed to create notebook.")
@@ -343,14 +529,20 @@ def main():
         st.markdown("---")
         st.subheader("📓 Notebooks")
         if st.session_state.notebooks:
+            # Options are ids: the counts change with every message and must not reset the selection
+            notebooks_by_id = {nb["id"]: nb for nb in st.session_state.notebooks}
             selected = st.selectbox(
                 "Select notebook",
-                options=st.session_state.notebooks,
-                format_func=lambda n: n.get("title") or str(n.get("id")),
+                options=list(notebooks_by_id),
+                format_func=lambda nid: (
+                    f"{notebooks_by_id[nid].get('title') or nid} "
+                    f"({notebooks_by_id[nid].get('source_count', 0)} sources, "
+                    f"{notebooks_by_id[nid].get('message_count', 0)} messages)"
+                ),
                 key="_nb_select",
             )
             if selected:
-                st.session_state.current_notebook_id = selected.get("id")
+                st.session_state.current_notebook_id = selected
         else:
             st.info("No notebooks available yet.")
 
@@ -359,7 +551,7 @@ def main():
     if notebook_id:
         # Check if we need to load history for this notebook
         if st.session_state.last_loaded_id != notebook_id:
-            st.session_state.messages = api_get_chat_history(notebook_id)
+            st.session_state.messages, st.session_state.older_messages_cursor = api_get_chat_history(notebook_id)
             st.session_state.last_loaded_id = notebook_id
             
         upload_section(notebook_id)
@@ -371,5 +563,5 @@ def main():
 if __name__ == "__main__":
     # Ensure current_notebook_id is updated when selection changes
     if "_nb_select" in st.session_state and st.session_state._nb_select:
-        st.session_state.current_notebook_id = st.session_state._nb_select.get("id")
+        st.session_state.current_notebook_id = st.session_state._nb_select
     main()
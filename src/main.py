@@ -1,7 +1,15 @@
+from contextlib import asynccontextmanager
+
 from fastapi import Depends, FastAPI, UploadFile, File
 from starlette.middleware.sessions import SessionMiddleware
 
+from src.ai_providers.dependencies import start_vector_service, stop_vector_service
+from src.ai_providers.ingestion import shutdown_parse_pool
+from src.database import SessionLocal
 from src.auth.router import router as auth_router
+from src.notebooks.chat_writer import chat_writer
+from src.notebooks.jobs import ingestion_pool
+from src.notebooks.service import get_recent_notebook_owners
 from src.notebooks.router import router as notebooks_router
 from src.config import settings
 
@@ -9,8 +17,24 @@ swagger_params = {
     "persistAuthorization": True
 }
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with SessionLocal() as db:
+        recent_notebooks = await get_recent_notebook_owners(db, settings.VECTOR_WARM_UP_NOTEBOOKS)
+    await start_vector_service(recent_notebooks)
+    await ingestion_pool.start()
+    await chat_writer.start()
+    yield
+    await ingestion_pool.stop()
+    await chat_writer.stop()
+    await stop_vector_service()
+    shutdown_parse_pool()
+
+
 app = FastAPI(
-    swagger_ui_parameters=swagger_params
+    swagger_ui_parameters=swagger_params,
+    lifespan=lifespan,
 )
 
 app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
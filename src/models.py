@@ -1,3 +1,3 @@
 from src.database import Base
 from src.users.models import User 
-from src.notebooks.models import Notebook, Source
\ No newline at end of file
+from src.notebooks.models import Notebook, Source, ChatMessage, ConversationSummary, IngestionJob
\ No newline at end of file
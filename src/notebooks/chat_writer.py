@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import Optional
+
+from src.config import settings
+from src.database import SessionLocal
+from .models import ChatMessage, Notebook
+
+from sqlalchemy import insert, update
+
+
+logger = logging.getLogger(__name__)
+
+
+# Write-behind queue for chat messages: whatever accumulated while the previous flush was
+# running goes out as one multi-row insert in one transaction. Callers that need durability
+# wait for the flush that contains their rows.
+class ChatMessageWriter:
+    def __init__(self, max_batch: int):
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue[tuple[list[dict], Optional[asyncio.Future]]] = asyncio.Queue()
+        self._worker: asyncio.Task = None
+
+    async def start(self):
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        # Rows accepted without a durability ack must not be lost on shutdown: the worker
+        # flushes everything queued before the sentinel, then exits.
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    async def write(self, rows: list[dict], durable: bool = True):
+        future = asyncio.get_running_loop().create_future() if durable else None
+        await self._queue.put((rows, future))
+        if future is not None:
+            await future
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._queue.get()
+            while True:
+                if item is None:
+                    stopping = True
+                else:
+                    batch.append(item)
+                if self._queue.empty() or len(batch) >= self.max_batch:
+                    break
+                item = self._queue.get_nowait()
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[list[dict], Optional[asyncio.Future]]]):
+        if not batch:
+            return
+
+        rows = [row for item_rows, _ in batch for row in item_rows]
+        try:
+            async with SessionLocal() as db:
+                await db.execute(insert(ChatMessage), rows)
+                await db.execute(
+                    update(Notebook)
+                    .where(Notebook.id.in_({row["notebook_id"] for row in rows}))
+                    .values(version=Notebook.version + 1)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.exception("Writing %s chat messages failed", len(rows))
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+
+chat_writer = ChatMessageWriter(settings.CHAT_WRITE_MAX_BATCH)
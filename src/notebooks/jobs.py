@@ -0,0 +1,215 @@
+import asyncio
+import logging
+from datetime import UTC, datetime, timedelta
+from typing import Optional
+
+from src.ai_providers.dependencies import get_vector_service
+from src.ai_providers.ingestion import copy_source_vectors, process_pdf_to_vectorstore
+from src.config import settings
+from src.database import SessionLocal
+from .models import IngestionJob, Notebook, Source
+
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobPhase:
+    QUEUED = "queued"
+    PARSING = "parsing"
+    EMBEDDING = "embedding"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+ACTIVE_PHASES = (JobPhase.QUEUED, JobPhase.PARSING, JobPhase.EMBEDDING)
+
+
+async def update_job(job_id: int, **values):
+    async with SessionLocal() as db:
+        await db.execute(update(IngestionJob).where(IngestionJob.id == job_id).values(**values))
+        await db.commit()
+
+
+async def complete_job(job_id: int, notebook_id: int, total: int):
+    # Newly indexed content invalidates answers cached for the notebook
+    async with SessionLocal() as db:
+        await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id)
+            .values(phase=JobPhase.COMPLETED, chunks_done=total, chunks_total=total)
+        )
+        await db.execute(
+            update(Notebook)
+            .where(Notebook.id == notebook_id)
+            .values(sources_version=Notebook.sources_version + 1)
+        )
+        await db.commit()
+
+
+async def retry_job(job_id: int) -> bool:
+    async with SessionLocal() as db:
+        result = await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, IngestionJob.phase == JobPhase.FAILED)
+            .values(phase=JobPhase.QUEUED)
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+
+async def claim_job(job_id: int) -> bool:
+    # Only one worker may move a job out of the queue, even if it was enqueued twice
+    async with SessionLocal() as db:
+        result = await db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, IngestionJob.phase == JobPhase.QUEUED)
+            .values(phase=JobPhase.PARSING, error=None)
+        )
+        await db.commit()
+        return result.rowcount == 1
+
+
+async def heartbeat(job_id: int):
+    # Keeps the job's lease (updated_at) fresh while it runs, including long parse or embed steps
+    while True:
+        await asyncio.sleep(settings.INGESTION_JOB_HEARTBEAT_SECONDS)
+        try:
+            await update_job(job_id, updated_at=datetime.now(tz=UTC))
+        except Exception:
+            logger.warning("Heartbeat for ingestion job %s failed", job_id, exc_info=True)
+
+
+class IngestionWorkerPool:
+    def __init__(self, size: int):
+        self.size = size
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        self._queued: set[int] = set()
+        self._workers: list[asyncio.Task] = []
+        self._reaper: asyncio.Task = None
+
+    async def start(self):
+        await self._requeue_unfinished()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.size)]
+        self._reaper = asyncio.create_task(self._reap())
+
+    async def stop(self):
+        tasks = [*self._workers, *([self._reaper] if self._reaper else [])]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._reaper = None
+
+    async def enqueue(self, job_id: int):
+        if job_id in self._queued:
+            return
+        self._queued.add(job_id)
+        await self._queue.put(job_id)
+
+    async def _requeue_unfinished(self):
+        # Several API processes share the jobs table, so a job counts as abandoned only once
+        # its lease ran out: the process running it crashed or restarted. Those go back to
+        # the queue and resume from their last checkpointed batch (chunks_done). Queued jobs
+        # are picked up by whichever process claims them first.
+        cutoff = datetime.now(tz=UTC) - timedelta(seconds=settings.INGESTION_JOB_LEASE_SECONDS)
+        async with SessionLocal() as db:
+            await db.execute(
+                update(IngestionJob)
+                .where(
+                    IngestionJob.phase.in_((JobPhase.PARSING, JobPhase.EMBEDDING)),
+                    IngestionJob.updated_at < cutoff,
+                )
+                .values(phase=JobPhase.QUEUED)
+            )
+            await db.commit()
+            result = await db.execute(
+                select(IngestionJob.id)
+                .where(IngestionJob.phase == JobPhase.QUEUED)
+                .order_by(IngestionJob.id)
+            )
+            job_ids = result.scalars().all()
+
+        for job_id in job_ids:
+            await self.enqueue(job_id)
+
+    async def _reap(self):
+        # Leases can run out at any time, not just while this process starts
+        while True:
+            await asyncio.sleep(settings.INGESTION_JOB_LEASE_SECONDS)
+            try:
+                await self._requeue_unfinished()
+            except Exception:
+                logger.exception("Requeueing abandoned ingestion jobs failed")
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ingestion job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: int):
+        if not await claim_job(job_id):
+            return
+
+        async with SessionLocal() as db:
+            job = await db.get(IngestionJob, job_id)
+            source = await db.get(Source, job.source_id)
+            duplicate = await db.get(Source, job.dedup_source_id) if job.dedup_source_id else None
+            # Duplicates are found across all users, so both owners are needed for the layout
+            notebook_ids = {job.notebook_id} | ({duplicate.notebook_id} if duplicate else set())
+            result = await db.execute(select(Notebook.id, Notebook.user_id).where(Notebook.id.in_(notebook_ids)))
+            owners = result.all()
+
+        vector_service = get_vector_service()
+        for notebook_id, user_id in owners:
+            vector_service.set_notebook_owner(notebook_id, user_id)
+
+        async def report_progress(done: int, total: Optional[int]):
+            await update_job(job_id, phase=JobPhase.EMBEDDING, chunks_done=done, chunks_total=total)
+
+        lease = asyncio.create_task(heartbeat(job_id))
+        try:
+            total = 0
+            if duplicate:
+                total = await copy_source_vectors(
+                    from_notebook_id=duplicate.notebook_id,
+                    from_source_id=duplicate.id,
+                    file_path=source.file_path,
+                    notebook_id=job.notebook_id,
+                    source_id=source.id,
+                    vector_service=vector_service,
+                    progress_callback=report_progress,
+                )
+            if not total:
+                # No duplicate, or its vectors are gone: index the file itself
+                if duplicate:
+                    await update_job(job_id, dedup_source_id=None)
+                total = await process_pdf_to_vectorstore(
+                    file_path=source.file_path,
+                    notebook_id=job.notebook_id,
+                    source_id=source.id,
+                    vector_service=vector_service,
+                    progress_callback=report_progress,
+                    resume_from=job.chunks_done,
+                )
+        except Exception as e:
+            logger.exception("Ingestion job %s failed", job_id)
+            await update_job(job_id, phase=JobPhase.FAILED, error=str(e))
+            return
+        finally:
+            lease.cancel()
+
+        await complete_job(job_id, job.notebook_id, total)
+
+
+ingestion_pool = IngestionWorkerPool(settings.INGESTION_WORKERS)
@@ -0,0 +1,97 @@
+import logging
+from typing import Optional
+
+from src.ai_providers.service import summarize_conversation
+from src.ai_providers.tokens import count_tokens, truncate_to_tokens
+from src.config import settings
+from src.database import SessionLocal
+from .models import ChatMessage, ConversationSummary
+
+from langchain_openai import ChatOpenAI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for one summarization call, so a long backlog is folded in over several refreshes
+MAX_MESSAGES_PER_REFRESH = 20
+
+# Notebooks with a refresh in progress; nothing ever waits for one, so a set is enough
+_refreshing: set[int] = set()
+
+
+async def get_conversation_summary(db: AsyncSession, notebook_id: int):
+    result = await db.execute(select(ConversationSummary).where(ConversationSummary.notebook_id == notebook_id))
+    return result.scalars().first()
+
+def compact_history(notebook_id: int, summary: Optional[str], messages: list) -> list:
+    # Newest first, like the chat history endpoint: the messages not yet folded into the summary that
+    # fit into HISTORY_TOKEN_BUDGET, followed by the summary itself as a "summary" message.
+    budget = settings.HISTORY_TOKEN_BUDGET
+    if summary:
+        budget -= count_tokens(summary, settings.OPENAI_MODEL_NAME)
+
+    history = []
+    for message in messages:
+        tokens = count_tokens(message.content, settings.OPENAI_MODEL_NAME)
+        if tokens > budget:
+            # The latest message is kept even if it alone is over budget, just cut short
+            if not history and budget > 0:
+                content = truncate_to_tokens(message.content, budget, settings.OPENAI_MODEL_NAME)
+                history.append(ChatMessage(notebook_id=notebook_id, role=message.role, content=content))
+            break
+        history.append(message)
+        budget -= tokens
+
+    if summary:
+        history.append(ChatMessage(notebook_id=notebook_id, role="summary", content=summary))
+    return history
+
+async def refresh_conversation_summary(notebook_id: int, llm: ChatOpenAI):
+    # Runs as a background task after an answer; a refresh already in progress for the
+    # notebook picks the new messages up on the next answer instead.
+    if notebook_id in _refreshing:
+        return
+
+    _refreshing.add(notebook_id)
+    try:
+        await _fold_old_messages(notebook_id, llm)
+    except Exception:
+        logger.exception("Refreshing conversation summary for notebook %s failed", notebook_id)
+    finally:
+        _refreshing.discard(notebook_id)
+
+async def _fold_old_messages(notebook_id: int, llm: ChatOpenAI):
+    async with SessionLocal() as db:
+        summary = await get_conversation_summary(db, notebook_id)
+        folded_until = summary.last_message_id if summary else 0
+        result = await db.execute(
+            select(ChatMessage)
+            .where(
+                ChatMessage.notebook_id == notebook_id,
+                ChatMessage.id > folded_until,
+            )
+            .order_by(ChatMessage.id)
+        )
+        messages = result.scalars().all()
+
+    # The last HISTORY_RECENT_TURNS turns stay verbatim
+    older = messages[:max(len(messages) - settings.HISTORY_RECENT_TURNS * 2, 0)]
+    if len(older) < settings.HISTORY_SUMMARY_BATCH:
+        return
+    older = older[:MAX_MESSAGES_PER_REFRESH]
+
+    text = await summarize_conversation(summary.summary if summary else "", older, llm)
+
+    async with SessionLocal() as db:
+        summary = await get_conversation_summary(db, notebook_id)
+        if (summary.last_message_id if summary else 0) != folded_until:
+            # Another worker folded these messages in the meantime
+            return
+        if summary is None:
+            summary = ConversationSummary(notebook_id=notebook_id)
+            db.add(summary)
+        summary.summary = text
+        summary.last_message_id = older[-1].id
+        await db.commit()
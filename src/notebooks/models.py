@@ -3,7 +3,7 @@ from datetime import UTC, datetime
 from src.database import Base
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import DateTime, Integer, String, ForeignKey, Text
+from sqlalchemy import BigInteger, DateTime, Integer, String, ForeignKey, Text
 import sqlalchemy as sa
 
 
@@ -13,17 +13,20 @@ class Notebook(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     title: Mapped[str] = mapped_column(String, unique=True, index=True, nullable=False)
+    sources_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    # Bumped whenever the notebook's sources or messages change; list endpoints derive ETags from it
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(tz=UTC),
+        default=lambda: datetime.now(tz=UTC),
         server_default=sa.text("CURRENT_TIMESTAMP"),
         nullable=False,
     )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(tz=UTC),
-        onupdate=datetime.now(tz=UTC),
+        default=lambda: datetime.now(tz=UTC),
+        onupdate=lambda: datetime.now(tz=UTC),
         server_default=sa.text("CURRENT_TIMESTAMP"),
         nullable=False,
     )
@@ -33,22 +36,25 @@ class Notebook(Base):
 
 class Source(Base):
     __tablename__ = "sources"
+    __table_args__ = (sa.Index("ix_sources_notebook_id_id", "notebook_id", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String, unique=False, index=True, nullable=False)
     file_path: Mapped[str] = mapped_column(String(512))
     notebook_id: Mapped[int] = mapped_column(ForeignKey("notebooks.id"))
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=True, index=True)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=True)
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(tz=UTC),
+        default=lambda: datetime.now(tz=UTC),
         server_default=sa.text("CURRENT_TIMESTAMP"),
         nullable=False,
     )
     updated_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(tz=UTC),
-        onupdate=datetime.now(tz=UTC),
+        default=lambda: datetime.now(tz=UTC),
+        onupdate=lambda: datetime.now(tz=UTC),
         server_default=sa.text("CURRENT_TIMESTAMP"),
         nullable=False,
     )
@@ -57,6 +63,7 @@ class Source(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (sa.Index("ix_chat_messages_notebook_id_id", "notebook_id", "id"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     notebook_id: Mapped[int] = mapped_column(ForeignKey("notebooks.id"))
@@ -65,7 +72,56 @@ class ChatMessage(Base):
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
-        default=datetime.now(tz=UTC),
+        default=lambda: datetime.now(tz=UTC),
         server_default=sa.text("CURRENT_TIMESTAMP"),
         nullable=False,
-    )
\ No newline at end of file
+    )
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    notebook_id: Mapped[int] = mapped_column(ForeignKey("notebooks.id"), unique=True, index=True)
+    summary: Mapped[str] = mapped_column(Text, nullable=False, default="")
+    # Every message up to and including this id is folded into the summary
+    last_message_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(tz=UTC),
+        server_default=sa.text("CURRENT_TIMESTAMP"),
+        nullable=False,
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(tz=UTC),
+        onupdate=lambda: datetime.now(tz=UTC),
+        server_default=sa.text("CURRENT_TIMESTAMP"),
+        nullable=False,
+    )
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    notebook_id: Mapped[int] = mapped_column(ForeignKey("notebooks.id"))
+    source_id: Mapped[int] = mapped_column(ForeignKey("sources.id"))
+    dedup_source_id: Mapped[int] = mapped_column(ForeignKey("sources.id"), nullable=True)
+    phase: Mapped[str] = mapped_column(String, nullable=False, default="queued", index=True)
+    chunks_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    chunks_total: Mapped[int] = mapped_column(Integer, nullable=True)
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(tz=UTC),
+        server_default=sa.text("CURRENT_TIMESTAMP"),
+        nullable=False,
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(tz=UTC),
+        onupdate=lambda: datetime.now(tz=UTC),
+        server_default=sa.text("CURRENT_TIMESTAMP"),
+        nullable=False,
+    )
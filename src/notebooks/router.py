@@ -1,44 +1,110 @@
 from typing import Optional
 from src.ai_providers.dependencies import VectorServiceDep
-from src.ai_providers.vector_store import VectorService
-from src.ai_providers.ingestion import process_pdf_to_vectorstore
 from src.auth.dependencies import get_current_user
 from src.database import get_db
 from src.users.models import User
-from .schemas import NotebookSchema, QuestionRequest
-from .service import add_notebook, get_user_notebooks, save_upload_file, send_question_to_llm, get_notebook_sources, get_notebook_chat_history
+from .jobs import ingestion_pool, retry_job
+from .memory import refresh_conversation_summary
+from .schemas import IngestionJobSchema, NotebookSchema, NotebookSummarySchema, QuestionRequest
+from .service import (
+    add_notebook,
+    create_ingestion_job,
+    delete_source,
+    ensure_source_idle,
+    etag_matches,
+    get_ingestion_job,
+    get_notebook_summaries,
+    get_notebook_versions,
+    get_user_notebook,
+    get_user_source,
+    listing_cache,
+    make_etag,
+    purge_source_data,
+    replace_source_file,
+    save_batch_upload,
+    save_upload_file,
+    send_question_to_llm,
+    stream_question_to_llm,
+    get_notebook_sources,
+    get_notebook_chat_history,
+)
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 router = APIRouter()
-vector_service = VectorService()
 
 
-@router.get("/", response_model=list[NotebookSchema])
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    # Clients revalidate on every read; a matching If-None-Match gets an empty 304
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+@router.get("/", response_model=list[NotebookSummarySchema])
 async def list_notebooks(
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    return await get_user_notebooks(current_user, db)
+    versions = await get_notebook_versions(current_user, db)
+    etag = make_etag("notebooks", current_user.id, versions)
+    if cached := not_modified(request, response, etag):
+        return cached
+
+    async def load():
+        rows = await get_notebook_summaries(current_user, db)
+        return [NotebookSummarySchema.model_validate(row).model_dump(mode="json") for row in rows]
+
+    return await listing_cache.get_or_set(etag, load)
 
 @router.get("/{notebook_id}/sources")
 async def list_notebook_sources(
     notebook_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    return await get_notebook_sources(notebook_id, current_user, db)
+    notebook = await get_user_notebook(db, notebook_id, current_user)
+    etag = make_etag("sources", notebook.id, notebook.version, limit, before_id, after_id)
+    if cached := not_modified(request, response, etag):
+        return cached
+
+    async def load():
+        return jsonable_encoder(await get_notebook_sources(notebook_id, db, limit, before_id, after_id))
+
+    return await listing_cache.get_or_set(etag, load)
 
 @router.get("/{notebook_id}/chat_history")
 async def get_chat_history(
     notebook_id: int,
-    limit: Optional[int] = None,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1),
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    return await get_notebook_chat_history(notebook_id, limit, current_user, db)
+    notebook = await get_user_notebook(db, notebook_id, current_user)
+    etag = make_etag("chat_history", notebook.id, notebook.version, limit, before_id, after_id)
+    if cached := not_modified(request, response, etag):
+        return cached
+
+    async def load():
+        return jsonable_encoder(await get_notebook_chat_history(notebook_id, db, limit, before_id, after_id))
+
+    return await listing_cache.get_or_set(etag, load)
 
 @router.post("/add", response_model=NotebookSchema)
 async def create_notebook(
@@ -48,7 +114,7 @@ async def create_notebook(
 ):
     return await add_notebook(title, current_user, db)
     
-@router.post("/source/{notebook_id}/upload")
+@router.post("/source/{notebook_id}/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_source_to_notebook(
     notebook_id: int, 
     file: UploadFile, 
@@ -57,27 +123,133 @@ async def upload_source_to_notebook(
 ):
     if file.content_type != "application/pdf":
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-    
-    source = await save_upload_file(db, notebook_id, file)
 
-    try:
-        await process_pdf_to_vectorstore(
-            file_path=source.file_path, 
-            notebook_id=notebook_id,
-            source_id=source.id,
-            vector_service=vector_service,
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"AI processing failed: {str(e)}")
+    await get_user_notebook(db, notebook_id, current_user)
+    source = await save_upload_file(db, notebook_id, file)
+    job = await create_ingestion_job(db, source)
+    await ingestion_pool.enqueue(job.id)
     
-    return {"message": "File uploaded and indexed", "source_id": source.id}
+    return {
+        "message": "File uploaded, indexing queued",
+        "source_id": source.id,
+        "job_id": job.id,
+        "deduplicated": job.dedup_source_id is not None,
+    }
+
+@router.post("/source/{notebook_id}/upload/batch", status_code=status.HTTP_202_ACCEPTED)
+async def upload_sources_batch(
+    notebook_id: int,
+    files: list[UploadFile],
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    await get_user_notebook(db, notebook_id, current_user)
+    results = await save_batch_upload(db, notebook_id, files)
+    queued = sum(result["status"] == "queued" for result in results)
+
+    return {
+        "message": f"{queued} of {len(results)} files uploaded, indexing queued",
+        "files": results,
+    }
+
+@router.put("/source/{source_id}", status_code=status.HTTP_202_ACCEPTED)
+async def replace_source(
+    source_id: int,
+    file: UploadFile,
+    vector_service: VectorServiceDep,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if file.content_type != "application/pdf":
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+
+    source = await get_user_source(db, source_id, current_user)
+    await ensure_source_idle(db, source)
+    vector_service.set_notebook_owner(source.notebook_id, current_user.id)
+    previous_path = await replace_source_file(db, source, file)
+    if previous_path is None:
+        return {"message": "File is unchanged", "source_id": source.id, "job_id": None, "deduplicated": False}
+
+    # Re-indexing only embeds the chunks whose text changed and drops the ones that are gone
+    job = await create_ingestion_job(db, source)
+    await ingestion_pool.enqueue(job.id)
+    background_tasks.add_task(purge_source_data, source.notebook_id, None, previous_path, vector_service)
+
+    return {
+        "message": "File replaced, re-indexing queued",
+        "source_id": source.id,
+        "job_id": job.id,
+        "deduplicated": job.dedup_source_id is not None,
+    }
+
+@router.delete("/source/{source_id}", status_code=status.HTTP_202_ACCEPTED)
+async def remove_source(
+    source_id: int,
+    vector_service: VectorServiceDep,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    source = await get_user_source(db, source_id, current_user)
+    await ensure_source_idle(db, source)
+    vector_service.set_notebook_owner(source.notebook_id, current_user.id)
+    notebook_id, file_path = source.notebook_id, source.file_path
+    await delete_source(db, source)
+    background_tasks.add_task(purge_source_data, notebook_id, source_id, file_path, vector_service)
+
+    return {"message": "Source deleted, cleanup queued", "source_id": source_id}
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobSchema)
+async def get_job_status(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await get_ingestion_job(job_id, current_user, db)
+
+@router.post("/jobs/{job_id}/retry", response_model=IngestionJobSchema)
+async def retry_failed_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    job = await get_ingestion_job(job_id, current_user, db)
+    if not await retry_job(job.id):
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried.")
+
+    await ingestion_pool.enqueue(job.id)
+    await db.refresh(job)
+    return job
 
 @router.post("/notebook/{notebook_id}/ask")
 async def ask_question(
     notebook_id: int,
     request: QuestionRequest,
     vector_service: VectorServiceDep,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    response = await send_question_to_llm(notebook_id, request, vector_service, current_user, db)
+    background_tasks.add_task(refresh_conversation_summary, notebook_id, vector_service.llm)
+    return response
+
+@router.post("/notebook/{notebook_id}/ask/stream")
+async def ask_question_stream(
+    notebook_id: int,
+    request: QuestionRequest,
+    vector_service: VectorServiceDep,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    return await send_question_to_llm(notebook_id, request, vector_service, current_user, db)
\ No newline at end of file
+    events = await stream_question_to_llm(notebook_id, request, vector_service, current_user, db)
+    # Runs once the stream has finished and the answer is saved
+    background_tasks.add_task(refresh_conversation_summary, notebook_id, vector_service.llm)
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
+    )
@@ -15,11 +15,19 @@ class NotebookSchema(BaseModel):
         from_attributes = True
 
 
+class NotebookSummarySchema(NotebookSchema):
+    source_count: int
+    message_count: int
+    last_activity_at: datetime
+
+
 class SourceSchema(BaseModel):
     id: int
     notebook_id: int
     file_path: str
     filename: str
+    content_hash: Optional[str] = None
+    size_bytes: Optional[int] = None
 
     created_at: datetime
     updated_at: datetime
@@ -28,7 +36,25 @@ class SourceSchema(BaseModel):
         from_attributes = True
 
 
+class IngestionJobSchema(BaseModel):
+    id: int
+    notebook_id: int
+    source_id: int
+    dedup_source_id: Optional[int] = None
+    phase: str
+    chunks_done: int
+    chunks_total: Optional[int] = None
+    error: Optional[str] = None
+
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class QuestionRequest(BaseModel):
     question: str = Field(..., min_length=1)
     source_ids: Optional[list[int]] = Field(None)
-    mode: str = Field("mmr")
\ No newline at end of file
+    mode: str = Field("mmr")
+    bypass_cache: bool = Field(False)
\ No newline at end of file
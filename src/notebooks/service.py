@@ -1,21 +1,51 @@
+import hashlib
+import json
+import logging
+import time
 import uuid
+import zipfile
+import zlib
+from typing import Optional
 
+from src.cache import create_cache
+from src.config import settings
 from src.users.models import User
-from .models import Notebook, Source, ChatMessage
+from .jobs import ACTIVE_PHASES, JobPhase, ingestion_pool
+from .chat_writer import chat_writer
+from .memory import compact_history
+from .models import Notebook, Source, ChatMessage, ConversationSummary, IngestionJob
 from .schemas import QuestionRequest
 from src.ai_providers.vector_store import VectorService
-from src.ai_providers.service import find_context, get_llm_answer, rephrase_user_query
+from src.ai_providers.service import (
+    StageTimer,
+    format_docs,
+    get_llm_answer,
+    lookup_cached_answer,
+    pack_context,
+    prepare_question,
+    resolve_documents,
+    store_cached_answer,
+    stream_llm_answer,
+)
 
+from sqlalchemy import delete, func, true, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from fastapi import HTTPException
+from sqlalchemy.orm import aliased
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pathlib import Path
 
 
+logger = logging.getLogger(__name__)
+
 UPLOAD_DIR = Path("/app/storage")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Rendered list responses keyed by their ETag, which already names the notebook versions and
+# query parameters they were built from
+listing_cache = create_cache("listing", settings.LISTING_CACHE_TTL_SECONDS, settings.LISTING_CACHE_MAX_ENTRIES)
+
 
 async def get_notebook_by_title(title: str, db: AsyncSession):
     query = select(Notebook).where(Notebook.title == title)
@@ -30,31 +60,136 @@ async def get_user_notebooks(user: User, db: AsyncSession, notebook_id: int = No
     result = await db.execute(query)
     return result.scalars().all()
 
+async def get_user_notebook(db: AsyncSession, notebook_id: int, current_user: User) -> Notebook:
+    notebooks = await get_user_notebooks(current_user, db, notebook_id)
+    if not notebooks:
+        raise HTTPException(status_code=404, detail="Notebook not found or access denied.")
+
+    return notebooks[0]
+
+async def get_notebook_summaries(user: User, db: AsyncSession):
+    # Counts and last activity for every notebook of the user in one statement. Both
+    # aggregates are limited to the user's notebooks so they stay on the notebook_id indexes.
+    user_notebooks = select(Notebook.id).where(Notebook.user_id == user.id)
+    sources = (
+        select(
+            Source.notebook_id,
+            func.count().label("source_count"),
+            func.max(Source.updated_at).label("last_source_at"),
+        )
+        .where(Source.notebook_id.in_(user_notebooks))
+        .group_by(Source.notebook_id)
+        .subquery()
+    )
+    messages = (
+        select(
+            ChatMessage.notebook_id,
+            func.count().label("message_count"),
+            func.max(ChatMessage.created_at).label("last_message_at"),
+        )
+        .where(ChatMessage.notebook_id.in_(user_notebooks))
+        .group_by(ChatMessage.notebook_id)
+        .subquery()
+    )
+    query = (
+        select(
+            Notebook.id,
+            Notebook.user_id,
+            Notebook.title,
+            Notebook.created_at,
+            Notebook.updated_at,
+            func.coalesce(sources.c.source_count, 0).label("source_count"),
+            func.coalesce(messages.c.message_count, 0).label("message_count"),
+            # greatest() skips NULLs, so notebooks without sources or messages fall back to updated_at
+            func.greatest(Notebook.updated_at, sources.c.last_source_at, messages.c.last_message_at).label("last_activity_at"),
+        )
+        .outerjoin(sources, sources.c.notebook_id == Notebook.id)
+        .outerjoin(messages, messages.c.notebook_id == Notebook.id)
+        .where(Notebook.user_id == user.id)
+        .order_by(Notebook.id)
+    )
+    result = await db.execute(query)
+    return result.all()
+
+async def get_notebook_versions(user: User, db: AsyncSession) -> list[tuple[int, int]]:
+    query = select(Notebook.id, Notebook.version).where(Notebook.user_id == user.id).order_by(Notebook.id)
+    result = await db.execute(query)
+    return [tuple(row) for row in result.all()]
+
+def bump_notebook_version(notebook_id: int):
+    return update(Notebook).where(Notebook.id == notebook_id).values(version=Notebook.version + 1)
+
+def make_etag(*parts) -> str:
+    # Weak: the same version always renders the same data, not necessarily the same bytes
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored on both sides
+    return "*" in candidates or etag.removeprefix("W/") in {candidate.removeprefix("W/") for candidate in candidates}
+
+async def get_recent_notebook_owners(db: AsyncSession, limit: int) -> dict[int, int]:
+    query = select(Notebook.id, Notebook.user_id).order_by(Notebook.updated_at.desc()).limit(limit)
+    result = await db.execute(query)
+    return {notebook_id: user_id for notebook_id, user_id in result.all()}
+
+async def keyset_page(
+    db: AsyncSession,
+    query,
+    id_column,
+    limit: int,
+    before_id: Optional[int],
+    after_id: Optional[int],
+    newest_first: bool,
+) -> dict:
+    # Pages walk the (notebook_id, id) index instead of counting past an offset. before_id
+    # pages towards older rows, after_id towards newer ones; next_cursor is the id to pass in
+    # the same parameter for the following page, or None once there is nothing left.
+    if before_id is not None:
+        query = query.where(id_column < before_id)
+    if after_id is not None:
+        query = query.where(id_column > after_id)
+
+    if after_id is not None:
+        ascending = True
+    elif before_id is not None:
+        ascending = False
+    else:
+        ascending = not newest_first
+    query = query.order_by(id_column.asc() if ascending else id_column.desc()).limit(limit + 1)
+
+    result = await db.execute(query)
+    rows = result.scalars().all()
+    items = rows[:limit]
+    return {"items": items, "next_cursor": items[-1].id if len(rows) > limit else None}
+
+def page_size(limit: Optional[int]) -> int:
+    return min(limit or settings.PAGE_SIZE_DEFAULT, settings.PAGE_SIZE_MAX)
+
 async def get_notebook_sources(
     notebook_id: int,
-    current_user: User,
     db: AsyncSession,
+    limit: Optional[int] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
 ):
-    query = select(Notebook).where(Notebook.id == notebook_id, Notebook.user_id == current_user.id).options(selectinload(Notebook.sources))
-    result = await db.execute(query)
-    notebook = result.scalars().first()
-    if not notebook:
-        raise HTTPException(status_code=404, detail="Notebook not found or access denied.")
-    
-    return notebook.sources
+    # Oldest first, in upload order
+    query = select(Source).where(Source.notebook_id == notebook_id)
+    return await keyset_page(db, query, Source.id, page_size(limit), before_id, after_id, newest_first=False)
 
 async def get_notebook_chat_history(
     notebook_id: int,
-    limit: int | None,
-    current_user: User,
     db: AsyncSession,
+    limit: Optional[int] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
 ):
-    notebooks = await get_user_notebooks(current_user, db, notebook_id)
-    if not notebooks:
-        raise HTTPException(status_code=404, detail="Notebook not found or access denied.")
-    
-    chat_messages = await get_chat_history(db, notebook_id, limit)
-    return chat_messages
+    # Newest first, so the first page is the end of the conversation
+    query = select(ChatMessage).where(ChatMessage.notebook_id == notebook_id)
+    return await keyset_page(db, query, ChatMessage.id, page_size(limit), before_id, after_id, newest_first=True)
 
 async def add_notebook(title: str, current_user: User, db: AsyncSession):
     existing_notebook = await get_notebook_by_title(title, db)
@@ -71,6 +206,33 @@ async def add_notebook(title: str, current_user: User, db: AsyncSession):
     await db.refresh(new_notebook)
     return new_notebook
 
+def _write_chunk(buffer, digest, chunk: bytes):
+    digest.update(chunk)
+    buffer.write(chunk)
+
+async def stream_upload_to_disk(file, dest_path: Path) -> tuple[str, int]:
+    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+    digest = hashlib.sha256()
+    size_bytes = 0
+
+    buffer = await run_in_threadpool(open, dest_path, "wb")
+    try:
+        while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+            size_bytes += len(chunk)
+            if size_bytes > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File exceeds the maximum upload size of {settings.MAX_UPLOAD_SIZE_MB} MB.",
+                )
+            await run_in_threadpool(_write_chunk, buffer, digest, chunk)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(dest_path.unlink, missing_ok=True)
+        raise
+
+    await run_in_threadpool(buffer.close)
+    return digest.hexdigest(), size_bytes
+
 async def save_upload_file(
     db: AsyncSession,
     notebook_id: int,
@@ -80,42 +242,300 @@ async def save_upload_file(
     unique_filename = f"{uuid.uuid4()}{file_ext}"
     dest_path = UPLOAD_DIR / unique_filename
 
-    # Save to disk
-    with open(dest_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    content_hash, size_bytes = await stream_upload_to_disk(file, dest_path)
 
-    new_source = Source(notebook_id=notebook_id, file_path=str(dest_path), title=file.filename)
+    new_source = Source(
+        notebook_id=notebook_id,
+        file_path=str(dest_path),
+        title=file.filename,
+        content_hash=content_hash,
+        size_bytes=size_bytes,
+    )
 
     db.add(new_source)
+    await db.execute(bump_notebook_version(notebook_id))
     await db.commit()
     await db.refresh(new_source)
     return new_source
 
-async def save_chat_message(
-    db: AsyncSession,
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+
+class ZipMemberUpload:
+    # Reads one archive member like an UploadFile, decompressing chunk by chunk in a thread
+    # so the archive is never extracted as a whole
+    def __init__(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo):
+        self.archive = archive
+        self.info = info
+        self.filename = Path(info.filename).name
+        self._member = None
+
+    async def read(self, size: int = -1) -> bytes:
+        if self._member is None:
+            self._member = await run_in_threadpool(self.archive.open, self.info)
+        return await run_in_threadpool(self._member.read, size)
+
+    async def close(self):
+        if self._member is not None:
+            await run_in_threadpool(self._member.close)
+
+
+def _is_zip(file) -> bool:
+    return file.content_type in ZIP_CONTENT_TYPES or Path(file.filename or "").suffix.lower() == ".zip"
+
+def _zip_pdf_members(archive: zipfile.ZipFile) -> list[zipfile.ZipInfo]:
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and Path(info.filename).suffix.lower() == ".pdf"
+        and not info.filename.startswith("__MACOSX/")
+    ]
+
+async def _unpack_batch(files, archives: list[zipfile.ZipFile]) -> tuple[list, list[dict]]:
+    # Only the central directory of each archive is read here; members are decompressed
+    # while they are saved. Opened archives are added to archives for the caller to close.
+    entries, rejected = [], []
+    for file in files:
+        if _is_zip(file):
+            try:
+                # Starlette spools uploads to a seekable temporary file, which zipfile reads in place
+                archive = await run_in_threadpool(zipfile.ZipFile, file.file)
+            except zipfile.BadZipFile:
+                rejected.append({"filename": file.filename, "status": "failed", "error": "Not a valid ZIP archive"})
+                continue
+            archives.append(archive)
+            members = await run_in_threadpool(_zip_pdf_members, archive)
+            entries.extend(ZipMemberUpload(archive, info) for info in members)
+        elif file.content_type == "application/pdf":
+            entries.append(file)
+        else:
+            rejected.append({"filename": file.filename, "status": "failed", "error": "Only PDF and ZIP files are allowed"})
+    return entries, rejected
+
+async def save_batch_upload(db: AsyncSession, notebook_id: int, files) -> list[dict]:
+    archives = []
+    try:
+        return await _save_batch_entries(db, notebook_id, files, archives)
+    finally:
+        for archive in archives:
+            await run_in_threadpool(archive.close)
+
+async def _save_batch_entries(db: AsyncSession, notebook_id: int, files, archives: list) -> list[dict]:
+    entries, results = await _unpack_batch(files, archives)
+    if len(entries) > settings.BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch may contain at most {settings.BATCH_UPLOAD_MAX_FILES} PDF files.",
+        )
+
+    # Each job is queued as soon as its file is on disk, so the ingestion workers (up to
+    # INGESTION_WORKERS files at a time) run while the rest of the batch is still being saved
+    for entry in entries:
+        try:
+            source = await save_upload_file(db, notebook_id, entry)
+            job = await create_ingestion_job(db, source)
+        except HTTPException as e:
+            results.append({"filename": entry.filename, "status": "failed", "error": e.detail})
+            continue
+        except (zipfile.BadZipFile, zlib.error, NotImplementedError, RuntimeError, EOFError) as e:
+            # Corrupt, encrypted or unsupported members fail on their own
+            results.append({"filename": entry.filename, "status": "failed", "error": f"Could not unpack file: {e}"})
+            continue
+        finally:
+            if isinstance(entry, ZipMemberUpload):
+                await entry.close()
+
+        await ingestion_pool.enqueue(job.id)
+        results.append({
+            "filename": entry.filename,
+            "status": "queued",
+            "source_id": source.id,
+            "job_id": job.id,
+            "deduplicated": job.dedup_source_id is not None,
+        })
+    return results
+
+async def find_indexed_duplicate(db: AsyncSession, source: Source):
+    # A replaced source keeps its old completed job, so it only counts once no newer job is open
+    other_job = aliased(IngestionJob)
+    unfinished = select(other_job.id).where(
+        other_job.source_id == Source.id,
+        other_job.phase != JobPhase.COMPLETED,
+    )
+    query = (
+        select(Source)
+        .join(IngestionJob, IngestionJob.source_id == Source.id)
+        .where(
+            Source.content_hash == source.content_hash,
+            Source.id != source.id,
+            IngestionJob.phase == JobPhase.COMPLETED,
+            ~unfinished.exists(),
+        )
+        .order_by(Source.id)
+        .limit(1)
+    )
+    result = await db.execute(query)
+    return result.scalars().first()
+
+async def create_ingestion_job(db: AsyncSession, source: Source):
+    duplicate = await find_indexed_duplicate(db, source)
+    new_job = IngestionJob(
+        notebook_id=source.notebook_id,
+        source_id=source.id,
+        dedup_source_id=duplicate.id if duplicate else None,
+    )
+    db.add(new_job)
+    await db.commit()
+    await db.refresh(new_job)
+    return new_job
+
+async def get_user_source(db: AsyncSession, source_id: int, current_user: User) -> Source:
+    query = (
+        select(Source)
+        .join(Notebook, Notebook.id == Source.notebook_id)
+        .where(Source.id == source_id, Notebook.user_id == current_user.id)
+    )
+    result = await db.execute(query)
+    source = result.scalars().first()
+    if not source:
+        raise HTTPException(status_code=404, detail="Source not found or access denied.")
+
+    return source
+
+async def ensure_source_idle(db: AsyncSession, source: Source):
+    # A running job would write vectors back after they were cleaned up
+    query = select(IngestionJob.id).where(
+        IngestionJob.source_id == source.id,
+        IngestionJob.phase.in_(ACTIVE_PHASES),
+    )
+    result = await db.execute(query)
+    if result.first():
+        raise HTTPException(status_code=409, detail="Source is still being indexed.")
+
+async def detach_duplicates(db: AsyncSession, source: Source):
+    # Queued jobs that were going to copy this source's vectors index their own file instead
+    await db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.dedup_source_id == source.id)
+        .values(dedup_source_id=None)
+    )
+
+async def delete_source(db: AsyncSession, source: Source):
+    # Vectors and the stored file are cleaned up afterwards by purge_source_data
+    await detach_duplicates(db, source)
+    await db.execute(delete(IngestionJob).where(IngestionJob.source_id == source.id))
+    await db.execute(
+        update(Notebook)
+        .where(Notebook.id == source.notebook_id)
+        .values(sources_version=Notebook.sources_version + 1, version=Notebook.version + 1)
+    )
+    await db.delete(source)
+    await db.commit()
+
+async def replace_source_file(db: AsyncSession, source: Source, file) -> Optional[str]:
+    # Returns the path of the previous file once the source points at the new one, or
+    # None when the upload is identical and nothing needs re-indexing
+    file_ext = Path(file.filename).suffix
+    dest_path = UPLOAD_DIR / f"{uuid.uuid4()}{file_ext}"
+    content_hash, size_bytes = await stream_upload_to_disk(file, dest_path)
+    if content_hash == source.content_hash:
+        await run_in_threadpool(dest_path.unlink, missing_ok=True)
+        return None
+
+    await detach_duplicates(db, source)
+    previous_path = source.file_path
+    source.file_path = str(dest_path)
+    source.title = file.filename
+    source.content_hash = content_hash
+    source.size_bytes = size_bytes
+    await db.execute(bump_notebook_version(source.notebook_id))
+    await db.commit()
+    await db.refresh(source)
+    return previous_path
+
+async def purge_source_data(
     notebook_id: int,
-    message_role: str,
-    message_content: str,
+    source_id: Optional[int],
+    file_path: str,
+    vector_service: VectorService,
 ):
-    new_message = ChatMessage(notebook_id=notebook_id, role=message_role, content=message_content)
-    db.add(new_message)
-    await db.commit()
-    await db.refresh(new_message)
-    return new_message
+    # Background cleanup after a source was deleted (source_id) or its file replaced
+    try:
+        if source_id is not None:
+            await vector_service.adelete_records(notebook_id, where={"source_id": source_id})
+        await run_in_threadpool(Path(file_path).unlink, missing_ok=True)
+    except Exception:
+        logger.exception("Cleaning up source %s of notebook %s failed", source_id, notebook_id)
 
-async def get_chat_history(
+async def get_ingestion_job(
+    job_id: int,
+    current_user: User,
     db: AsyncSession,
-    notebook_id: int,
-    limit: int = 10,
 ):
-    if limit is None:
-        query = select(ChatMessage).where(ChatMessage.notebook_id == notebook_id).order_by(ChatMessage.id.desc())
-    else:
-        query = select(ChatMessage).where(ChatMessage.notebook_id == notebook_id).order_by(ChatMessage.id.desc()).limit(limit)
-    
+    query = (
+        select(IngestionJob)
+        .join(Notebook, Notebook.id == IngestionJob.notebook_id)
+        .where(IngestionJob.id == job_id, Notebook.user_id == current_user.id)
+    )
     result = await db.execute(query)
-    return result.scalars().all()
+    job = result.scalars().first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found or access denied.")
+
+    return job
+
+async def load_ask_context(
+    db: AsyncSession,
+    notebook_id: int,
+    current_user: User,
+) -> tuple[int, list]:
+    # Ownership check, conversation summary and the unsummarized messages in one round trip
+    recent = (
+        select(ChatMessage.id, ChatMessage.role, ChatMessage.content)
+        .where(
+            ChatMessage.notebook_id == Notebook.id,
+            ChatMessage.id > func.coalesce(ConversationSummary.last_message_id, 0),
+        )
+        .order_by(ChatMessage.id.desc())
+        .limit(settings.HISTORY_RECENT_TURNS * 2 + settings.HISTORY_SUMMARY_BATCH)
+        .lateral()
+    )
+    result = await db.execute(
+        select(Notebook.sources_version, ConversationSummary.summary, recent.c.id, recent.c.role, recent.c.content)
+        .select_from(Notebook)
+        .outerjoin(ConversationSummary, ConversationSummary.notebook_id == Notebook.id)
+        .outerjoin(recent, true())
+        .where(Notebook.id == notebook_id, Notebook.user_id == current_user.id)
+        .order_by(recent.c.id.desc())
+    )
+    rows = result.all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Notebook not found or access denied.")
+
+    messages = [
+        ChatMessage(id=row.id, notebook_id=notebook_id, role=row.role, content=row.content)
+        for row in rows if row.id is not None
+    ]
+    return rows[0].sources_version, compact_history(notebook_id, rows[0].summary, messages)
+
+async def save_exchange(
+    db: AsyncSession,
+    notebook_id: int,
+    question: str,
+    answer: str,
+):
+    # The question and its answer are stored together, once the answer exists
+    rows = [
+        {"notebook_id": notebook_id, "role": "human", "content": question},
+        {"notebook_id": notebook_id, "role": "ai", "content": answer},
+    ]
+    if settings.CHAT_WRITE_BEHIND:
+        await chat_writer.write(rows, durable=settings.CHAT_WRITE_DURABLE_ACK)
+        return
+
+    db.add_all([ChatMessage(**row) for row in rows])
+    await db.execute(bump_notebook_version(notebook_id))
+    await db.commit()
 
 async def send_question_to_llm(
     notebook_id: int,
@@ -124,32 +544,134 @@ async def send_question_to_llm(
     current_user: User,
     db: AsyncSession,
 ):
-    notebooks = await get_user_notebooks(current_user, db, notebook_id=notebook_id)
-    if not notebooks:
-        raise HTTPException(status_code=404, detail="Notebook not found or access denied.")
-    
-    await save_chat_message(db, notebook_id, "human", request.question)
+    sources_version, chat_history = await load_ask_context(db, notebook_id, current_user)
+    vector_service.set_notebook_owner(notebook_id, current_user.id)
 
-    chat_history = await get_chat_history(db, notebook_id)
-    
-    standalone_question = await rephrase_user_query(
-        query=request.question,
-        chat_history=chat_history[1:] if len(chat_history) > 1 else [],
-        llm=vector_service.llm
+    timer = StageTimer()
+    standalone_question, speculative = await prepare_question(
+        notebook_id, sources_version, request, chat_history, vector_service, timer
     )
-    
-    retrieval_request = request.model_copy()
-    retrieval_request.question = standalone_question
 
-    context = await find_context(notebook_id, retrieval_request, vector_service)
+    cache_key = None
+    if not request.bypass_cache:
+        with timer.stage("cache_lookup"):
+            cached, cache_key = await lookup_cached_answer(
+                notebook_id, sources_version, standalone_question, request, vector_service
+            )
+        if cached:
+            if speculative:
+                speculative.cancel()
+            cached.metadata.timings = timer.finish()
+            await save_exchange(db, notebook_id, request.question, cached.answer)
+            return cached
 
-    response = await get_llm_answer(
-        query=standalone_question, 
-        context=context, 
-        chat_history=chat_history[1:] if len(chat_history) > 1 else [], 
-        llm=vector_service.llm
+    docs = await resolve_documents(
+        notebook_id, sources_version, request, standalone_question, speculative, vector_service, timer
     )
+    packed, context_tokens = pack_context(docs)
+
+    with timer.stage("answer"):
+        response = await get_llm_answer(
+            query=standalone_question,
+            context=format_docs(packed),
+            chat_history=chat_history,
+            llm=vector_service.llm
+        )
+    response.metadata.retrieval_strategy = timer.strategy
+    response.metadata.context_tokens = context_tokens
+    response.metadata.timings = timer.finish()
+    if cache_key:
+        store_cached_answer(cache_key, response, vector_service)
+
+    await save_exchange(db, notebook_id, request.question, response.answer)
+
+    return response
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_question_to_llm(
+    notebook_id: int,
+    request: QuestionRequest,
+    vector_service: VectorService,
+    current_user: User,
+    db: AsyncSession,
+):
+    sources_version, chat_history = await load_ask_context(db, notebook_id, current_user)
+    vector_service.set_notebook_owner(notebook_id, current_user.id)
+
+    return _question_event_stream(notebook_id, sources_version, request, vector_service, chat_history, db)
+
+async def _question_event_stream(
+    notebook_id: int,
+    sources_version: int,
+    request: QuestionRequest,
+    vector_service: VectorService,
+    chat_history: list,
+    db: AsyncSession,
+):
+    try:
+        timer = StageTimer()
+        yield format_sse("stage", {"stage": "rephrasing"})
+        standalone_question, speculative = await prepare_question(
+            notebook_id, sources_version, request, chat_history, vector_service, timer
+        )
+
+        cache_key = None
+        if not request.bypass_cache:
+            with timer.stage("cache_lookup"):
+                cached, cache_key = await lookup_cached_answer(
+                    notebook_id, sources_version, standalone_question, request, vector_service
+                )
+            if cached:
+                if speculative:
+                    speculative.cancel()
+                cached.metadata.timings = timer.finish()
+                await save_exchange(db, notebook_id, request.question, cached.answer)
+                yield format_sse("token", {"text": cached.answer})
+                yield format_sse("answer", cached.model_dump())
+                return
+
+        yield format_sse("stage", {"stage": "retrieving"})
+        docs = await resolve_documents(
+            notebook_id, sources_version, request, standalone_question, speculative, vector_service, timer
+        )
+        packed, context_tokens = pack_context(docs)
+        yield format_sse("sources", [
+            {
+                "source_id": doc.metadata.get("source_id"),
+                "page": doc.metadata.get("page", 0) + 1,
+                "chunk_index": doc.metadata.get("chunk_index"),
+            }
+            for doc in packed
+        ])
+
+        yield format_sse("stage", {"stage": "generating"})
+        answer_started = time.perf_counter()
+        response = None
+        streamed = ""
+        async for partial in stream_llm_answer(
+            query=standalone_question,
+            context=format_docs(packed),
+            chat_history=chat_history,
+            llm=vector_service.llm
+        ):
+            response = partial
+            if partial.answer.startswith(streamed) and len(partial.answer) > len(streamed):
+                yield format_sse("token", {"text": partial.answer[len(streamed):]})
+                streamed = partial.answer
 
-    await save_chat_message(db, notebook_id, "ai", response.answer)
+        if response is None:
+            raise ValueError("The model returned no answer.")
+        timer.timings["answer_ms"] = round((time.perf_counter() - answer_started) * 1000, 1)
+        response.metadata.retrieval_strategy = timer.strategy
+        response.metadata.context_tokens = context_tokens
+        response.metadata.timings = timer.finish()
+        if cache_key:
+            store_cached_answer(cache_key, response, vector_service)
 
-    return response
\ No newline at end of file
+        await save_exchange(db, notebook_id, request.question, response.answer)
+        yield format_sse("answer", response.model_dump())
+    except Exception as e:
+        logger.exception("Streaming answer for notebook %s failed", notebook_id)
+        yield format_sse("error", {"detail": str(e)})
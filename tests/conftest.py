@@ -0,0 +1,38 @@
+import os
+
+# Settings are read on import and the OpenAI clients refuse to be built without a key
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import src.notebooks.chat_writer
+import src.notebooks.jobs
+from src.models import Base, Notebook, User
+
+
+@pytest.fixture
+async def session_factory(monkeypatch):
+    # In-memory SQLite stands in for Postgres; modules that open their own sessions use it too
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    for module in (src.notebooks.chat_writer, src.notebooks.jobs):
+        monkeypatch.setattr(module, "SessionLocal", factory)
+    yield factory
+    await engine.dispose()
+
+
+@pytest.fixture
+async def notebook(session_factory):
+    async with session_factory() as db:
+        user = User(email="owner@example.com")
+        db.add(user)
+        await db.flush()
+        notebook = Notebook(user_id=user.id, title="Notebook")
+        db.add(notebook)
+        await db.commit()
+        return notebook
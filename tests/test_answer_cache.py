@@ -0,0 +1,49 @@
+import time
+
+from src.ai_providers.answer_cache import AnswerCache
+from src.ai_providers.schemas import AskQuestionResponse
+
+
+SCOPE = ("base", ())
+
+
+def make_cache(**overrides) -> AnswerCache:
+    options = {"similarity_threshold": 0.95, "max_entries": 10, "ttl_seconds": 60, "max_notebooks": 10}
+    return AnswerCache(**(options | overrides))
+
+
+def response(answer: str) -> AskQuestionResponse:
+    return AskQuestionResponse.model_construct(answer=answer)
+
+
+def test_similar_question_hits_until_the_version_changes():
+    cache = make_cache()
+    cache.store(1, 1, SCOPE, "what is a pump", [1.0, 0.0], response("a device"))
+
+    hit, similarity = cache.lookup(1, 1, SCOPE, "what does a pump do", [0.99, 0.01])
+    assert hit.answer == "a device"
+    assert similarity > 0.95
+    assert cache.lookup(1, 2, SCOPE, "what is a pump", [1.0, 0.0]) is None
+    assert 1 not in cache._notebooks
+
+
+def test_least_recently_used_notebooks_are_evicted():
+    cache = make_cache(max_notebooks=2)
+    for notebook_id in (1, 2):
+        cache.store(notebook_id, 1, SCOPE, "question", [1.0, 0.0], response(str(notebook_id)))
+    cache.lookup(1, 1, SCOPE, "question", [1.0, 0.0])
+    cache.store(3, 1, SCOPE, "question", [1.0, 0.0], response("3"))
+
+    assert list(cache._notebooks) == [1, 3]
+
+
+def test_expired_notebooks_are_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = make_cache(ttl_seconds=60)
+    cache.store(1, 1, SCOPE, "question", [1.0, 0.0], response("1"))
+    now[0] += 61
+    cache.store(2, 1, SCOPE, "question", [1.0, 0.0], response("2"))
+
+    assert list(cache._notebooks) == [2]
+    assert cache.lookup(1, 1, SCOPE, "question", [1.0, 0.0]) is None
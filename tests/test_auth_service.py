@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+import src.auth.service as auth_service
+from src.auth.security import hash_password
+from src.config import settings
+
+
+class FakeSession:
+    commits = 0
+
+    async def commit(self):
+        self.commits += 1
+
+
+def make_user(monkeypatch):
+    # Stored with fewer rounds than configured, so the login wants to rehash it
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 4)
+    user = SimpleNamespace(id=1, email="owner@example.com", hashed_password=hash_password("secret"))
+    monkeypatch.setattr(settings, "BCRYPT_ROUNDS", 5)
+    return user
+
+
+async def login(monkeypatch, user, rehash):
+    async def get_user_by_email(db, email):
+        return user
+
+    monkeypatch.setattr(auth_service, "get_user_by_email", get_user_by_email)
+    monkeypatch.setattr(auth_service, "ahash_password", rehash)
+    db = FakeSession()
+    return await auth_service.authenticate_user(db, "owner@example.com", "secret"), db
+
+
+async def test_login_succeeds_when_the_rehash_is_turned_away(monkeypatch):
+    user = make_user(monkeypatch)
+    old_hash = user.hashed_password
+
+    async def overloaded(password):
+        raise HTTPException(status_code=503, detail="Too many authentication requests")
+
+    token, db = await login(monkeypatch, user, overloaded)
+
+    assert token.access_token
+    assert user.hashed_password == old_hash
+    assert db.commits == 0
+
+
+async def test_rehash_is_skipped_while_every_worker_is_busy(monkeypatch):
+    user = make_user(monkeypatch)
+    monkeypatch.setattr(auth_service, "password_worker_idle", lambda: False)
+    calls = []
+
+    async def rehash(password):
+        calls.append(password)
+        return "rehashed"
+
+    token, _ = await login(monkeypatch, user, rehash)
+
+    assert token.access_token
+    assert calls == []
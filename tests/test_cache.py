@@ -0,0 +1,169 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import src.cache
+from src.cache import Cache, MemoryCacheBackend
+
+
+def make_cache(backend=None) -> Cache:
+    return Cache(backend or MemoryCacheBackend(max_entries=100, max_bytes=1 << 20), "test", ttl_seconds=60)
+
+
+class BrokenBackend:
+    async def get(self, key):
+        raise ConnectionError("cache is down")
+
+    async def set(self, key, value, ttl_seconds):
+        raise ConnectionError("cache is down")
+
+    async def add(self, key, value, ttl_seconds):
+        raise ConnectionError("cache is down")
+
+    async def delete(self, key):
+        raise ConnectionError("cache is down")
+
+
+async def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_entries=2, max_bytes=1 << 20)
+    await backend.set("a", "1", 60)
+    await backend.set("b", "2", 60)
+    await backend.get("a")
+    await backend.set("c", "3", 60)
+
+    assert await backend.get("a") == "1"
+    assert await backend.get("b") is None
+    assert await backend.get("c") == "3"
+
+
+async def test_memory_backend_is_bounded_by_value_size():
+    backend = MemoryCacheBackend(max_entries=100, max_bytes=10)
+    await backend.set("a", "x" * 6, 60)
+    await backend.set("b", "y" * 6, 60)
+
+    assert await backend.get("a") is None
+    assert await backend.get("b") == "y" * 6
+
+
+async def test_memory_backend_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(src.cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    backend = MemoryCacheBackend(max_entries=100, max_bytes=1 << 20)
+    await backend.set("a", "1", 60)
+
+    assert not await backend.add("a", "2", 60)
+    now[0] += 61
+    assert await backend.get("a") is None
+    assert await backend.add("a", "2", 60)
+
+
+async def test_get_or_set_loads_once_for_concurrent_misses():
+    cache = make_cache()
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"answer": 42}
+
+    results = await asyncio.gather(*(cache.get_or_set("key", loader) for _ in range(10)))
+
+    assert results == [{"answer": 42}] * 10
+    assert calls == 1
+    assert await cache.get("key") == {"answer": 42}
+
+
+async def test_get_or_set_shares_errors_without_caching_them():
+    cache = make_cache()
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise ValueError("loader failed")
+
+    async def loader():
+        return "fresh"
+
+    results = await asyncio.gather(*(cache.get_or_set("key", failing) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in results)
+    assert calls == 1
+    assert await cache.get_or_set("key", loader) == "fresh"
+
+
+async def test_waiter_takes_over_when_the_loading_request_is_cancelled():
+    cache = make_cache()
+    started = asyncio.Event()
+
+    async def never_finishes():
+        started.set()
+        await asyncio.Event().wait()
+
+    async def loader():
+        return "value"
+
+    leader = asyncio.create_task(cache.get_or_set("key", never_finishes))
+    await started.wait()
+    waiter = asyncio.create_task(cache.get_or_set("key", loader))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await waiter == "value"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_workers_sharing_a_backend_load_once(monkeypatch):
+    monkeypatch.setattr(src.cache.settings, "CACHE_LOCK_POLL_MS", 5)
+    backend = MemoryCacheBackend(max_entries=100, max_bytes=1 << 20)
+    # Two Cache objects on one backend behave like two worker processes sharing Redis
+    first, second = make_cache(backend), make_cache(backend)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "value"
+
+    assert await asyncio.gather(first.get_or_set("key", loader), second.get_or_set("key", loader)) == ["value", "value"]
+    assert calls == 1
+
+
+async def test_lock_waiter_loads_itself_when_the_holder_fails(monkeypatch):
+    monkeypatch.setattr(src.cache.settings, "CACHE_LOCK_POLL_MS", 5)
+    backend = MemoryCacheBackend(max_entries=100, max_bytes=1 << 20)
+    first, second = make_cache(backend), make_cache(backend)
+
+    async def failing():
+        await asyncio.sleep(0.02)
+        raise ValueError("loader failed")
+
+    async def loader():
+        return "value"
+
+    results = await asyncio.gather(
+        first.get_or_set("key", failing), second.get_or_set("key", loader), return_exceptions=True
+    )
+
+    assert isinstance(results[0], ValueError)
+    assert results[1] == "value"
+
+
+async def test_broken_backend_counts_as_a_miss():
+    cache = make_cache(BrokenBackend())
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        return "value"
+
+    assert await cache.get_or_set("key", loader) == "value"
+    assert await cache.get_or_set("key", loader) == "value"
+    assert calls == 2
+    assert cache.stats()["misses"] == 2
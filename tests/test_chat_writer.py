@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import select
+
+from src.notebooks.chat_writer import ChatMessageWriter
+from src.notebooks.models import ChatMessage, Notebook
+
+
+def message(notebook, content: str) -> dict:
+    return {"notebook_id": notebook.id, "role": "user", "content": content}
+
+
+async def stored_messages(session_factory) -> list[str]:
+    async with session_factory() as db:
+        result = await db.execute(select(ChatMessage.content).order_by(ChatMessage.id))
+        return list(result.scalars().all())
+
+
+async def test_durable_write_returns_once_stored(session_factory, notebook):
+    writer = ChatMessageWriter(max_batch=10)
+    await writer.start()
+    try:
+        await writer.write([message(notebook, "question"), message(notebook, "answer")])
+        assert await stored_messages(session_factory) == ["question", "answer"]
+    finally:
+        await writer.stop()
+
+
+async def test_stop_flushes_writes_without_durability_ack(session_factory, notebook):
+    writer = ChatMessageWriter(max_batch=10)
+    await writer.start()
+    for index in range(25):
+        await writer.write([message(notebook, f"message {index}")], durable=False)
+    await writer.stop()
+
+    assert await stored_messages(session_factory) == [f"message {index}" for index in range(25)]
+
+
+async def test_failed_flush_reaches_the_writer_and_later_writes_go_through(session_factory, notebook):
+    writer = ChatMessageWriter(max_batch=10)
+    await writer.start()
+    try:
+        with pytest.raises(Exception):
+            await writer.write([{"notebook_id": notebook.id, "role": None, "content": "broken"}])
+        await writer.write([message(notebook, "after")])
+    finally:
+        await writer.stop()
+
+    assert await stored_messages(session_factory) == ["after"]
+
+
+async def test_flush_bumps_the_notebook_version(session_factory, notebook):
+    writer = ChatMessageWriter(max_batch=10)
+    await writer.start()
+    try:
+        await writer.write([message(notebook, "question")])
+        await writer.write([message(notebook, "answer")])
+    finally:
+        await writer.stop()
+
+    async with session_factory() as db:
+        assert (await db.get(Notebook, notebook.id)).version == 2
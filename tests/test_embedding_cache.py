@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+from langchain_core.embeddings import Embeddings
+
+import src.ai_providers.embedding_cache as embedding_cache
+from src.ai_providers.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def make_cache(tmp_path, max_bytes=1 << 20):
+    return CachedEmbeddings(CountingEmbeddings(), "model", str(tmp_path / "embeddings.sqlite3"), max_bytes)
+
+
+def last_used(cache) -> dict[str, float]:
+    return dict(cache._conn.execute("SELECT text_hash, last_used FROM embeddings"))
+
+
+def test_cached_texts_are_not_embedded_again(tmp_path):
+    cache = make_cache(tmp_path)
+
+    assert cache.embed_documents(["a", "bb"]) == [[1.0, 1.0], [2.0, 1.0]]
+    assert cache.embed_documents(["bb", "ccc", "ccc"]) == [[2.0, 1.0], [3.0, 1.0], [3.0, 1.0]]
+    assert cache.embeddings.texts == ["a", "bb", "ccc"]
+
+
+def test_size_is_tracked_without_counting_rows_twice(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.embed_documents(["a", "bb"])
+    # Stored again, e.g. by a concurrent request that missed at the same time
+    cache._store({cache._hash("a"): [1.0, 1.0]})
+
+    assert cache._total_bytes == 16
+    assert make_cache(tmp_path)._total_bytes == 16
+
+
+def test_least_recently_used_vectors_are_evicted(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = make_cache(tmp_path, max_bytes=16)
+    cache.embed_documents(["a"])
+    now[0] += embedding_cache.TOUCH_INTERVAL_SECONDS + 1
+    cache.embed_documents(["b"])
+    now[0] += embedding_cache.TOUCH_INTERVAL_SECONDS + 1
+    cache.embed_documents(["a"])
+    cache.embed_documents(["c"])
+
+    assert set(last_used(cache)) == {cache._hash("a"), cache._hash("c")}
+    assert cache._total_bytes == 16
+
+
+def test_hits_only_write_once_the_touch_interval_passed(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = make_cache(tmp_path)
+    cache.embed_documents(["a"])
+
+    now[0] += 60
+    cache.embed_documents(["a"])
+    assert last_used(cache) == {cache._hash("a"): 1000.0}
+
+    now[0] += embedding_cache.TOUCH_INTERVAL_SECONDS
+    cache.embed_documents(["a"])
+    assert last_used(cache) == {cache._hash("a"): now[0]}
@@ -0,0 +1,45 @@
+import pytest
+
+from src.ai_providers.flat_index import FlatIndexClient
+
+
+@pytest.fixture
+def collection(tmp_path):
+    collection = FlatIndexClient(str(tmp_path)).get_or_create_collection("notebook_1")
+    collection.upsert(
+        ids=["a", "b", "c"],
+        embeddings=[[0.0, 0.0], [1.0, 0.0], [5.0, 5.0]],
+        documents=["origin", "near", "far"],
+        metadatas=[{"source_id": 1}, {"source_id": 1}, {"source_id": 2}],
+    )
+    return collection
+
+
+def test_query_returns_nearest_rows_by_squared_distance(collection):
+    results = collection.query(query_embeddings=[[0.9, 0.0]], n_results=2)
+
+    assert results["ids"] == [["b", "a"]]
+    assert results["distances"][0] == pytest.approx([0.01, 0.81])
+
+
+def test_query_applies_metadata_filters(collection):
+    results = collection.query(query_embeddings=[[0.0, 0.0]], n_results=3, where={"source_id": {"$in": [2]}})
+
+    assert results["ids"] == [["c"]]
+
+
+def test_upsert_replaces_and_delete_frees_rows(collection):
+    collection.upsert(ids=["a"], embeddings=[[9.0, 9.0]], documents=["moved"], metadatas=[{"source_id": 3}])
+    collection.delete(where={"source_id": 1})
+    collection.upsert(ids=["d"], embeddings=[[2.0, 2.0]], documents=["new"], metadatas=[{"source_id": 1}])
+
+    assert collection.count() == 3
+    assert collection.get(ids=["a"])["documents"] == ["moved"]
+    assert len(collection._rows) == 3
+
+
+def test_collection_is_reopened_from_disk(tmp_path, collection):
+    reopened = FlatIndexClient(str(tmp_path)).get_collection("notebook_1")
+
+    assert reopened.count() == 3
+    assert reopened.query(query_embeddings=[[5.0, 5.0]], n_results=1)["ids"] == [["c"]]
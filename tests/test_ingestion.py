@@ -0,0 +1,120 @@
+import pytest
+from langchain_core.documents import Document
+
+import src.ai_providers.ingestion as ingestion
+from src.ai_providers.flat_index import FlatIndexClient
+from src.ai_providers.ingestion import process_pdf_to_vectorstore
+from src.config import settings
+
+
+NOTEBOOK_ID = 1
+SOURCE_ID = 7
+
+
+class RecordingEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    async def aembed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), float(sum(map(ord, text)) % 97)] for text in texts]
+
+
+class FlatVectorService:
+    # The record methods of VectorService on a single flat collection
+    def __init__(self, path):
+        self.collection = FlatIndexClient(str(path)).get_or_create_collection("notebook")
+        self.embeddings = RecordingEmbeddings()
+        self.upserted = []
+
+    async def aget_source_records(self, notebook_id, source_id, include=None, limit=None, offset=None):
+        return self.collection.get(
+            where={"$and": [{"notebook_id": notebook_id}, {"source_id": source_id}]},
+            include=include if include is not None else ["embeddings", "documents", "metadatas"],
+            limit=limit,
+            offset=offset,
+        )
+
+    async def aget_records(self, notebook_id, ids, include=None):
+        return self.collection.get(ids=ids, where={"notebook_id": notebook_id}, include=include)
+
+    async def aupsert_records(self, notebook_id, ids, embeddings, documents, metadatas):
+        self.upserted.extend(ids)
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    async def adelete_records(self, notebook_id, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
+
+    def chunks(self) -> list[str]:
+        records = self.collection.get(include=["documents", "metadatas"])
+        ordered = sorted(zip(records["metadatas"], records["documents"]), key=lambda record: record[0]["chunk_index"])
+        return [text for _, text in ordered]
+
+
+@pytest.fixture
+def vector_service(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_BATCH_SIZE", 2)
+    return FlatVectorService(tmp_path)
+
+
+async def ingest(vector_service, monkeypatch, texts: list[str], file_path: str = "/uploads/a.pdf"):
+    async def iter_pdf_chunks(path):
+        # One "page range" per text, already split
+        for page, text in enumerate(texts):
+            yield [Document(page_content=text, metadata={"source": path, "page": page})]
+
+    monkeypatch.setattr(ingestion, "iter_pdf_chunks", iter_pdf_chunks)
+    vector_service.embeddings.texts.clear()
+    vector_service.upserted.clear()
+    return await process_pdf_to_vectorstore(file_path, NOTEBOOK_ID, SOURCE_ID, vector_service)
+
+
+async def test_first_ingestion_embeds_every_chunk(vector_service, monkeypatch):
+    texts = ["alpha", "beta", "gamma", "delta", "epsilon"]
+
+    assert await ingest(vector_service, monkeypatch, texts) == 5
+    assert vector_service.embeddings.texts == texts
+    assert vector_service.chunks() == texts
+
+
+async def test_unchanged_file_under_a_new_path_writes_nothing(vector_service, monkeypatch):
+    texts = ["alpha", "beta", "gamma", "delta", "epsilon"]
+    await ingest(vector_service, monkeypatch, texts)
+
+    await ingest(vector_service, monkeypatch, texts, file_path="/uploads/b.pdf")
+
+    assert vector_service.embeddings.texts == []
+    assert vector_service.upserted == []
+
+
+async def test_only_changed_chunks_are_embedded(vector_service, monkeypatch):
+    await ingest(vector_service, monkeypatch, ["alpha", "beta", "gamma", "delta", "epsilon"])
+
+    await ingest(vector_service, monkeypatch, ["alpha", "beta", "GAMMA", "delta", "epsilon"])
+
+    assert vector_service.embeddings.texts == ["GAMMA"]
+    assert vector_service.chunks() == ["alpha", "beta", "GAMMA", "delta", "epsilon"]
+
+
+async def test_moved_chunks_reuse_their_stored_vectors(vector_service, monkeypatch):
+    await ingest(vector_service, monkeypatch, ["alpha", "beta", "gamma"])
+    before = vector_service.collection.get(include=["embeddings", "documents"])
+    vectors = {text: list(vector) for text, vector in zip(before["documents"], before["embeddings"])}
+
+    await ingest(vector_service, monkeypatch, ["intro", "alpha", "beta", "gamma"])
+
+    assert vector_service.embeddings.texts == ["intro"]
+    assert vector_service.chunks() == ["intro", "alpha", "beta", "gamma"]
+    after = vector_service.collection.get(include=["embeddings", "documents"])
+    for text, vector in zip(after["documents"], after["embeddings"]):
+        if text in vectors:
+            assert list(vector) == vectors[text]
+
+
+async def test_duplicate_chunks_within_a_source_are_kept_apart(vector_service, monkeypatch):
+    await ingest(vector_service, monkeypatch, ["same", "other", "same"])
+
+    await ingest(vector_service, monkeypatch, ["same", "other"])
+
+    assert vector_service.embeddings.texts == []
+    assert vector_service.chunks() == ["same", "other"]
@@ -0,0 +1,63 @@
+from datetime import UTC, datetime, timedelta
+
+from src.config import settings
+from src.notebooks.jobs import IngestionWorkerPool, JobPhase, claim_job, retry_job
+from src.notebooks.models import IngestionJob, Source
+
+
+async def create_job(session_factory, notebook, **values) -> int:
+    async with session_factory() as db:
+        source = Source(title="paper.pdf", file_path="/tmp/paper.pdf", notebook_id=notebook.id)
+        db.add(source)
+        await db.flush()
+        job = IngestionJob(notebook_id=notebook.id, source_id=source.id, **values)
+        db.add(job)
+        await db.commit()
+        return job.id
+
+
+async def get_job(session_factory, job_id: int) -> IngestionJob:
+    async with session_factory() as db:
+        return await db.get(IngestionJob, job_id)
+
+
+async def test_claim_job_succeeds_only_once(session_factory, notebook):
+    job_id = await create_job(session_factory, notebook, error="previous attempt")
+
+    assert await claim_job(job_id)
+    assert not await claim_job(job_id)
+
+    job = await get_job(session_factory, job_id)
+    assert job.phase == JobPhase.PARSING
+    assert job.error is None
+
+
+async def test_failed_job_is_claimable_again_after_retry(session_factory, notebook):
+    job_id = await create_job(session_factory, notebook, phase=JobPhase.FAILED)
+
+    assert not await claim_job(job_id)
+    assert await retry_job(job_id)
+    assert not await retry_job(job_id)
+    assert await claim_job(job_id)
+
+
+async def test_requeue_unfinished_only_takes_expired_leases(session_factory, notebook):
+    expired_at = datetime.now(tz=UTC) - timedelta(seconds=settings.INGESTION_JOB_LEASE_SECONDS + 60)
+    abandoned = await create_job(
+        session_factory, notebook, phase=JobPhase.EMBEDDING, chunks_done=64, updated_at=expired_at
+    )
+    running = await create_job(session_factory, notebook, phase=JobPhase.PARSING)
+    queued = await create_job(session_factory, notebook)
+    failed = await create_job(session_factory, notebook, phase=JobPhase.FAILED, updated_at=expired_at)
+
+    pool = IngestionWorkerPool(size=1)
+    await pool._requeue_unfinished()
+    # A second pass, like the reaper's, must not queue the same jobs twice
+    await pool._requeue_unfinished()
+
+    job = await get_job(session_factory, abandoned)
+    assert job.phase == JobPhase.QUEUED
+    assert job.chunks_done == 64
+    assert (await get_job(session_factory, running)).phase == JobPhase.PARSING
+    assert (await get_job(session_factory, failed)).phase == JobPhase.FAILED
+    assert [pool._queue.get_nowait() for _ in range(pool._queue.qsize())] == [abandoned, queued]
@@ -0,0 +1,68 @@
+from langchain_core.documents import Document
+
+from src.ai_providers.hybrid_retriever import reciprocal_rank_fusion
+from src.ai_providers.lexical_index import BM25Index, LexicalIndexStore, tokenize
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Part XR-200/b ships") == ["part", "xr-200/b", "xr", "200", "b", "ships"]
+
+
+def test_bm25_ranks_rare_exact_terms_first():
+    index = BM25Index()
+    index.add("a", "the pump uses seal XR-200", {"source_id": 1})
+    index.add("b", "the pump and the pump housing", {"source_id": 1})
+    index.add("c", "the valve", {"source_id": 2})
+
+    assert [chunk_id for chunk_id, _ in index.search("XR-200 pump", k=3)] == ["a", "b"]
+    assert index.search("valve", k=3, source_ids=[1]) == []
+
+
+def test_bm25_remove_forgets_the_chunk():
+    index = BM25Index()
+    index.add("a", "seal", {})
+    index.add("b", "pump", {})
+    index.remove("a")
+
+    assert index.search("seal", k=3) == []
+    assert len(index) == 1
+    assert index.total_length == 1
+
+
+def test_store_reloads_evicted_notebooks_from_their_log(tmp_path):
+    store = LexicalIndexStore(str(tmp_path), max_notebooks=1, max_chunks=100)
+    store.add(1, ["a", "b"], ["seal XR-200", "pump"], [{"source_id": 1}, {"source_id": 1}])
+    store.remove(1, ["b"])
+    store.add(2, ["c"], ["valve"], [{"source_id": 2}])
+
+    assert list(store._indexes) == [2]
+    assert [doc.id for doc in store.search(1, "seal pump", k=5)] == ["a"]
+    assert list(store._indexes) == [1]
+
+
+
+def test_workers_sharing_a_log_keep_each_others_entries(tmp_path):
+    first = LexicalIndexStore(str(tmp_path), max_notebooks=4, max_chunks=100)
+    second = LexicalIndexStore(str(tmp_path), max_notebooks=4, max_chunks=100)
+    first.add(1, ["a"], ["seal"], [{"source_id": 1}])
+    second.add(1, ["b"], ["pump"], [{"source_id": 1}])
+    first.remove(1, ["b"])
+    with second._file_lock(1):
+        second.get(1)
+        second._compact(1)
+    first.add(1, ["c"], ["valve"], [{"source_id": 1}])
+
+    for store in (first, second, LexicalIndexStore(str(tmp_path), max_notebooks=4, max_chunks=100)):
+        assert sorted(doc.id for doc in store.search(1, "seal pump valve", k=5)) == ["a", "c"]
+
+
+def test_reciprocal_rank_fusion_favours_chunks_found_by_both():
+    def doc(chunk_index):
+        return Document(page_content=str(chunk_index), metadata={"source_id": 1, "chunk_index": chunk_index})
+
+    dense = [doc(1), doc(2), doc(3)]
+    lexical = [doc(3), doc(4), doc(1)]
+
+    fused = reciprocal_rank_fusion([dense, lexical], k=3)
+
+    assert [d.metadata["chunk_index"] for d in fused] == [1, 3, 2]
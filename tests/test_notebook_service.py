@@ -0,0 +1,48 @@
+from sqlalchemy import select
+
+from src.notebooks.models import ChatMessage
+from src.notebooks.service import etag_matches, keyset_page, make_etag
+
+
+async def page(session_factory, notebook, **cursor) -> tuple[list[int], int]:
+    async with session_factory() as db:
+        query = select(ChatMessage).where(ChatMessage.notebook_id == notebook.id)
+        result = await keyset_page(
+            db,
+            query,
+            ChatMessage.id,
+            limit=2,
+            before_id=cursor.get("before_id"),
+            after_id=cursor.get("after_id"),
+            newest_first=True,
+        )
+    return [message.id for message in result["items"]], result["next_cursor"]
+
+
+async def test_keyset_pages_walk_both_directions(session_factory, notebook):
+    async with session_factory() as db:
+        db.add_all(ChatMessage(notebook_id=notebook.id, role="user", content=str(index)) for index in range(5))
+        await db.commit()
+
+    assert await page(session_factory, notebook) == ([5, 4], 4)
+    assert await page(session_factory, notebook, before_id=4) == ([3, 2], 2)
+    assert await page(session_factory, notebook, before_id=2) == ([1], None)
+    assert await page(session_factory, notebook, after_id=1) == ([2, 3], 3)
+    assert await page(session_factory, notebook, after_id=3) == ([4, 5], None)
+
+
+def test_etag_depends_on_every_part():
+    assert make_etag(1, 2, 50) == make_etag(1, 2, 50)
+    assert make_etag(1, 2, 50) != make_etag(1, 3, 50)
+    assert make_etag(1, 2, 50).startswith('W/"')
+
+
+def test_etag_matching_is_weak():
+    etag = make_etag("notebooks", 3)
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(etag.removeprefix("W/"), etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag("notebooks", 4), etag)
@@ -0,0 +1,54 @@
+import httpx
+import openai
+import pytest
+from langchain_core.embeddings import Embeddings
+
+import src.ai_providers.rate_limit as rate_limit
+from src.ai_providers.rate_limit import RateLimitedEmbeddings, RateLimiter
+
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+
+
+class FlakyEmbeddings(Embeddings):
+    def __init__(self, errors: list[Exception]):
+        self.errors = errors
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return [[1.0] for _ in texts]
+
+
+def rate_limited() -> openai.RateLimitError:
+    response = httpx.Response(429, headers={"retry-after": "0"}, request=REQUEST)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def make_embeddings(errors: list[Exception], max_retries: int = 2) -> RateLimitedEmbeddings:
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=0)
+    return RateLimitedEmbeddings(FlakyEmbeddings(errors), limiter, "text-embedding-3-small", max_retries, batch_size=100)
+
+
+async def test_rate_limited_and_connection_errors_are_retried(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_retry_delay", lambda error, attempt: 0)
+    embeddings = make_embeddings([rate_limited(), openai.APIConnectionError(request=REQUEST)])
+
+    assert await embeddings.aembed_documents(["a", "b"]) == [[1.0], [1.0]]
+    assert embeddings.embeddings.calls == 3
+
+
+async def test_gives_up_after_max_retries():
+    embeddings = make_embeddings([rate_limited() for _ in range(3)])
+
+    with pytest.raises(openai.RateLimitError):
+        await embeddings.aembed_documents(["a"])
+    assert embeddings.embeddings.calls == 3